@@ -1,15 +1,24 @@
-from fastapi import FastAPI, APIRouter, UploadFile, File, HTTPException, Form
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, APIRouter, UploadFile, File, HTTPException, Form, Query, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from starlette.routing import Match
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne, UpdateMany, DeleteMany, IndexModel, ReturnDocument, ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
 import os
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from pydantic import BaseModel, Field, model_validator
+from typing import List, Optional, Dict, Any, Tuple
+from functools import lru_cache, partial
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+from bisect import bisect_left
 import uuid
-from datetime import datetime
+import base64
+from datetime import datetime, timedelta
 import csv
 import io
 import re
@@ -17,14 +26,22 @@ import json
 import asyncio
 import time
 import shutil
+import subprocess
+import random
+import tempfile
+import numpy as np
+import orjson
+from itertools import islice
+from collections import deque
+from abc import ABC, abstractmethod
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.keys import Keys
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
+from selenium.webdriver.common.action_chains import ActionChains
+from selenium.common.exceptions import TimeoutException, NoSuchElementException, StaleElementReferenceException
 import time
 from urllib.parse import quote
 
@@ -42,9 +59,312 @@ app = FastAPI()
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
-# Global WebDriver instance
-driver = None
-whatsapp_authenticated = False
+# WhatsApp Web browser sessions: how many to run, where their Chromium profiles
+# live, when a session is restarted, and how often idle sessions are sampled
+# for the cached auth/QR/ready status
+WHATSAPP_SESSIONS = int(os.environ.get('WHATSAPP_SESSIONS', '1'))
+WHATSAPP_PROFILE_ROOT = os.environ.get('WHATSAPP_PROFILE_ROOT', '/tmp/whatsapp-automation')
+SESSION_MAX_SENDS = int(os.environ.get('SESSION_MAX_SENDS', '500'))
+SESSION_MAX_CONSECUTIVE_FAILURES = int(os.environ.get('SESSION_MAX_CONSECUTIVE_FAILURES', '3'))
+SESSION_STATUS_INTERVAL = float(os.environ.get('SESSION_STATUS_INTERVAL', '5'))
+
+# Server-Sent Events: comment line sent on idle streams so proxies keep them open,
+# and how many undelivered events a slow subscriber may hold before the oldest drop
+EVENT_STREAM_KEEPALIVE = float(os.environ.get('EVENT_STREAM_KEEPALIVE', '15'))
+EVENT_STREAM_BUFFER = int(os.environ.get('EVENT_STREAM_BUFFER', '100'))
+
+# Chromium launch profile: 'full' is the original windowed 1920x1080 browser,
+# 'lean' is headless with a small viewport and images/media blocked so many
+# sessions fit on one host. WHATSAPP_STARTUP_TIMEOUT caps the wait for the
+# app (chat list or QR code) after launch.
+WHATSAPP_DRIVER_PROFILE = os.environ.get('WHATSAPP_DRIVER_PROFILE', 'full')
+WHATSAPP_LEAN_WINDOW_SIZE = os.environ.get('WHATSAPP_LEAN_WINDOW_SIZE', '1024,768')
+WHATSAPP_DISK_CACHE_SIZE = int(os.environ.get('WHATSAPP_DISK_CACHE_SIZE', str(64 * 1024 * 1024)))
+WHATSAPP_STARTUP_TIMEOUT = float(os.environ.get('WHATSAPP_STARTUP_TIMEOUT', '10'))
+
+# Deadlines for a chat to become ready after navigation and for the sent
+# message to show up as an outgoing bubble
+SEND_READY_TIMEOUT = float(os.environ.get('SEND_READY_TIMEOUT', '30'))
+SEND_CONFIRM_TIMEOUT = float(os.environ.get('SEND_CONFIRM_TIMEOUT', '15'))
+
+# 'reload' always navigates to the send URL. 'in_page' opens each chat inside
+# the loaded app and falls back to a reload on failure; it has not been
+# verified against a live WhatsApp Web session, so it is opt-in.
+SEND_NAVIGATION = os.environ.get('SEND_NAVIGATION', 'reload')
+
+# Send queue: per-session rate limit, retry policy, how long a claimed message
+# may stay 'sending' before it is requeued, and the idle poll interval
+SEND_RATE_PER_MINUTE = float(os.environ.get('SEND_RATE_PER_MINUTE', '6'))
+SEND_RATE_BURST = float(os.environ.get('SEND_RATE_BURST', '1'))
+SEND_MAX_ATTEMPTS = int(os.environ.get('SEND_MAX_ATTEMPTS', '3'))
+SEND_RETRY_BACKOFF = float(os.environ.get('SEND_RETRY_BACKOFF', '30'))
+SEND_RETRY_BACKOFF_MAX = float(os.environ.get('SEND_RETRY_BACKOFF_MAX', '900'))
+SEND_CLAIM_TIMEOUT = float(os.environ.get('SEND_CLAIM_TIMEOUT', '300'))
+SEND_QUEUE_POLL_INTERVAL = float(os.environ.get('SEND_QUEUE_POLL_INTERVAL', '2'))
+
+# Message transport used by the send queue: 'selenium' drives the WhatsApp Web
+# sessions, 'mock' is an in-process stand-in for load tests and offline CI that
+# simulates latency (mean/jitter in seconds), transient failures, numbers not
+# on WhatsApp and rate-limit responses asking to retry after a delay
+SEND_TRANSPORT = os.environ.get('SEND_TRANSPORT', 'selenium')
+MOCK_TRANSPORT_CHANNELS = int(os.environ.get('MOCK_TRANSPORT_CHANNELS', '4'))
+MOCK_TRANSPORT_LATENCY = float(os.environ.get('MOCK_TRANSPORT_LATENCY', '0.2'))
+MOCK_TRANSPORT_JITTER = float(os.environ.get('MOCK_TRANSPORT_JITTER', '0.05'))
+MOCK_TRANSPORT_FAILURE_RATE = float(os.environ.get('MOCK_TRANSPORT_FAILURE_RATE', '0.02'))
+MOCK_TRANSPORT_INVALID_RATE = float(os.environ.get('MOCK_TRANSPORT_INVALID_RATE', '0.01'))
+MOCK_TRANSPORT_RATE_LIMIT_RATE = float(os.environ.get('MOCK_TRANSPORT_RATE_LIMIT_RATE', '0.01'))
+MOCK_TRANSPORT_RETRY_AFTER = float(os.environ.get('MOCK_TRANSPORT_RETRY_AFTER', '5'))
+MOCK_TRANSPORT_SEED = os.environ.get('MOCK_TRANSPORT_SEED')
+
+# Number of contacts parsed and written to MongoDB per batch during CSV import
+CSV_INGEST_BATCH_SIZE = int(os.environ.get('CSV_INGEST_BATCH_SIZE', '1000'))
+
+# Country code applied to phone numbers written without one, and the length of
+# a national number in that country (10 digits for India)
+DEFAULT_COUNTRY_CODE = os.environ.get('DEFAULT_COUNTRY_CODE', '91')
+NATIONAL_NUMBER_LENGTH = int(os.environ.get('NATIONAL_NUMBER_LENGTH', '10'))
+
+# Header aliases for the name and phone columns of uploaded CSVs, plus columns
+# that are dropped entirely. Matching ignores case, underscores and extra
+# whitespace; CSV_COLUMN_ALIASES in the environment (JSON) overrides any role.
+CSV_COLUMN_ALIASES = {
+    "name": ["name", "contact name"],
+    "phone": ["phone", "number", "phone number", "contact number"],
+    "ignore": ["sno", "s.no"],
+}
+CSV_COLUMN_ALIASES.update(json.loads(os.environ.get('CSV_COLUMN_ALIASES', '{}')))
+
+# Indexes each collection needs; created idempotently at startup by ensure_indexes()
+COLLECTION_INDEXES = {
+    "contacts": [
+        IndexModel([("phone", ASCENDING)], name="phone_unique", unique=True),
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)], name="created_at_id_desc"),
+    ],
+    "templates": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("created_at", DESCENDING)], name="created_at_desc"),
+    ],
+    "message_logs": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        # Log listing: one equality filter, then the keyset sort; a created_at
+        # range rides on the sort key. Also serve the exports walked backwards.
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)], name="created_at_id_desc"),
+        IndexModel([("status", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="status_created_at_id"),
+        IndexModel([("phone", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="phone_created_at_id"),
+        IndexModel([("contact_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="contact_id_created_at_id"),
+        IndexModel([("campaign_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="campaign_id_created_at_id"),
+        # Send queue claims and stale-claim recovery
+        IndexModel([("status", ASCENDING), ("next_attempt_at", ASCENDING)], name="status_next_attempt_at"),
+        IndexModel([("status", ASCENDING), ("claimed_at", ASCENDING)], name="status_claimed_at"),
+        # Progress counters rebuilt per bulk run
+        IndexModel([("campaign_id", ASCENDING), ("status", ASCENDING)], name="campaign_id_status"),
+    ],
+    "import_jobs": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("status", ASCENDING)], name="status"),
+    ],
+    "campaigns": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)], name="created_at_id_desc"),
+    ],
+}
+
+# Page size limits for keyset-paginated list endpoints; message logs keep
+# their original page of 500
+DEFAULT_PAGE_SIZE = 1000
+DEFAULT_LOG_PAGE_SIZE = 500
+MAX_PAGE_SIZE = 5000
+
+# Contacts rendered and message logs written per chunk by send-bulk
+SEND_BATCH_SIZE = int(os.environ.get('SEND_BATCH_SIZE', '500'))
+
+# Completed sends per bulk run used to estimate the current send rate and ETA
+SEND_PROGRESS_RATE_WINDOW = int(os.environ.get('SEND_PROGRESS_RATE_WINDOW', '50'))
+
+# Documents per Motor batch and rows per streamed chunk for the export endpoints
+EXPORT_BATCH_SIZE = 1000
+
+# Running background import tasks (kept referenced so they are not garbage collected)
+import_tasks = set()
+
+# Background imports record which process runs them and touch heartbeat_at
+# this often; a queued or running job whose heartbeat is older than
+# IMPORT_STALE_AFTER belonged to a process that died and is marked failed.
+# Other processes' live jobs are never touched.
+IMPORT_HEARTBEAT_INTERVAL = float(os.environ.get('IMPORT_HEARTBEAT_INTERVAL', '10'))
+IMPORT_STALE_AFTER = float(os.environ.get('IMPORT_STALE_AFTER', '60'))
+IMPORT_WORKER_ID = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+# Campaign summaries of runs still sending are recomputed when read if older
+# than this; completed campaigns are served from the summary as stored
+CAMPAIGN_STATS_TTL = float(os.environ.get('CAMPAIGN_STATS_TTL', '10'))
+CAMPAIGN_LATENCY_PERCENTILES = (50, 90, 99)
+campaign_tasks = set()
+
+# Metrics
+# Counters, gauges and histograms rendered in the Prometheus text format on
+# /metrics. Every update happens on the event loop thread (worker-thread and
+# browser-thread work is timed from the awaiting side), so an update is a
+# dict lookup and an add with no locking. Per-row loops are timed once per
+# batch, never per row.
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+METRICS = []
+
+def escape_label_value(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def format_labels(names: Tuple[str, ...], values: tuple) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{escape_label_value(value)}"' for name, value in zip(names, values)) + "}"
+
+class Metric:
+    type = "untyped"
+    
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._values = {}
+        METRICS.append(self)
+    
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels[name] for name in self.labels)
+    
+    def samples(self):
+        for key, value in self._values.items():
+            yield f"{self.name}{format_labels(self.labels, key)} {value}"
+    
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+class Counter(Metric):
+    type = "counter"
+    
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+class Gauge(Metric):
+    type = "gauge"
+    
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+    
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+class Histogram(Metric):
+    type = "histogram"
+    
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = (), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+    
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        state = self._values.get(key)
+        if state is None:
+            # Per-bucket counts (the last is +Inf), sum, count
+            state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        state[0][bisect_left(self.buckets, value)] += 1
+        state[1] += value
+        state[2] += 1
+    
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+    
+    def samples(self):
+        for key, (counts, total, count) in self._values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                yield f"{self.name}_bucket{format_labels(self.labels + ('le',), key + (le,))} {cumulative}"
+            yield f"{self.name}_sum{format_labels(self.labels, key)} {total}"
+            yield f"{self.name}_count{format_labels(self.labels, key)} {count}"
+
+def render_metrics() -> str:
+    return "\n".join(metric.render() for metric in METRICS) + "\n"
+
+HTTP_REQUESTS = Counter("http_requests_total", "HTTP requests by route and status", ("method", "route", "status"))
+HTTP_REQUEST_SECONDS = Histogram("http_request_duration_seconds", "HTTP request latency, to the last body byte", ("method", "route"))
+HTTP_IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests being handled", ("method", "route"))
+CSV_PARSE_SECONDS = Histogram("csv_parse_batch_seconds", "Parsing and phone normalization time per CSV batch")
+CSV_ROWS = Counter("csv_rows_total", "CSV rows by ingest outcome", ("outcome",))
+MONGO_WRITE_SECONDS = Histogram("mongo_write_seconds", "MongoDB write latency by operation", ("operation",))
+MONGO_DOCUMENTS_WRITTEN = Counter("mongo_documents_written_total", "Documents sent to MongoDB writes by operation", ("operation",))
+TEMPLATE_RENDER_SECONDS = Histogram("template_render_batch_seconds", "Template rendering time per send-bulk chunk")
+TEMPLATE_MESSAGES_RENDERED = Counter("template_messages_rendered_total", "Messages rendered by send-bulk")
+SELENIUM_STEP_SECONDS = Histogram("selenium_step_seconds", "WhatsApp Web automation step latency", ("step",))
+SEND_RESULTS = Counter("send_results_total", "Send attempts by transport and outcome", ("transport", "outcome"))
+
+# Message template engine
+# Placeholders look like {field} or {field|default}; the default is used when a
+# contact has no value for the field. Anything else in braces is literal text.
+PLACEHOLDER_PATTERN = re.compile(r'\{([^{}|]+)(?:\|([^{}]*))?\}')
+
+# Top-level contact fields usable as placeholders besides additional_fields
+CONTACT_PLACEHOLDER_FIELDS = ("name", "phone")
+
+class CompiledTemplate:
+    """A template parsed once into literal and placeholder segments"""
+    
+    def __init__(self, text: str):
+        self.text = text
+        # Literals are str; placeholders are (field, default, original text) tuples
+        self.segments = []
+        position = 0
+        for match in PLACEHOLDER_PATTERN.finditer(text):
+            if match.start() > position:
+                self.segments.append(text[position:match.start()])
+            self.segments.append((match.group(1).strip(), match.group(2), match.group(0)))
+            position = match.end()
+        if position < len(text):
+            self.segments.append(text[position:])
+        
+        self.placeholders = list(dict.fromkeys(
+            segment[0] for segment in self.segments if isinstance(segment, tuple)
+        ))
+    
+    def render(self, contact: dict) -> Tuple[str, List[str]]:
+        """Return the message for a contact and the placeholders it had no value for"""
+        fields = contact.get("additional_fields") or {}
+        parts = []
+        missing = []
+        for segment in self.segments:
+            if isinstance(segment, str):
+                parts.append(segment)
+                continue
+            
+            field, default, original = segment
+            value = fields.get(field)
+            if value is None and field in CONTACT_PLACEHOLDER_FIELDS:
+                value = contact.get(field)
+            
+            if value is not None:
+                parts.append(str(value))
+            elif default is not None:
+                parts.append(default)
+            else:
+                # Leave unknown placeholders in the message, as before
+                parts.append(original)
+                missing.append(field)
+        return ''.join(parts), missing
+
+@lru_cache(maxsize=128)
+def compile_template(text: str) -> CompiledTemplate:
+    return CompiledTemplate(text)
 
 # Define Models
 class Contact(BaseModel):
@@ -59,100 +379,296 @@ class MessageTemplate(BaseModel):
     content: str
     placeholders: List[str] = Field(default_factory=list)
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    
+    @model_validator(mode='after')
+    def parse_placeholders(self):
+        # Placeholders always come from the content, never from the client
+        self.placeholders = compile_template(self.content).placeholders
+        return self
 
 class MessageLog(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     contact_id: str
     phone: str
     message: str
-    status: str  # 'pending', 'sent', 'failed'
+    status: str  # 'pending', 'sending', 'sent', 'failed', 'unconfirmed'
     sent_at: Optional[datetime] = None
     error_message: Optional[str] = None
+    attempts: int = 0
+    next_attempt_at: Optional[datetime] = None
+    claimed_by: Optional[str] = None
+    claimed_at: Optional[datetime] = None
+    campaign_id: Optional[str] = None  # the send-bulk run that created this message
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
 class BulkMessageRequest(BaseModel):
     template: str
     contact_ids: List[str]
+    auto_send: bool = False  # queue for the server-side send workers instead of browser links
 
 class WhatsAppStatus(BaseModel):
     authenticated: bool
     qr_available: bool
     message: str
+    ready: bool = False
+    session: int = 0
+    checked_at: Optional[datetime] = None
+
+class ImportJob(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    filename: str
+    status: str = "queued"  # 'queued', 'running', 'completed', 'failed'
+    rows_parsed: int = 0
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    skipped: int = 0
+    invalid_phones: int = 0
+    error_message: Optional[str] = None
+    owner: Optional[str] = None  # IMPORT_WORKER_ID of the process running it
+    heartbeat_at: Optional[datetime] = Field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+class CampaignStats(BaseModel):
+    total: int = 0
+    counts: Dict[str, int] = Field(default_factory=dict)
+    success_rate: Optional[float] = None  # sent / (sent + failed)
+    # Seconds from a message being queued to it being sent
+    latency_p50: Optional[float] = None
+    latency_p90: Optional[float] = None
+    latency_p99: Optional[float] = None
+    computed_at: Optional[datetime] = None
+
+class Campaign(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    template: str
+    auto_send: bool = False
+    status: str = "preparing"  # 'preparing', 'sending', 'completed', 'failed'
+    total_contacts: int = 0
+    stats: CampaignStats = Field(default_factory=CampaignStats)
+    completed_at: Optional[datetime] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+# Browser executor
+class BrowserExecutor:
+    """Runs blocking WebDriver calls on one dedicated thread behind awaitable methods.
+
+    A WebDriver session is not thread-safe, so every call for a driver goes
+    through the same single-thread executor; the event loop only awaits.
+    """
+    
+    def __init__(self, name: str = "browser"):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=name)
+    
+    async def run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(func, *args, **kwargs))
+
+# Event streams
+class EventBroker:
+    """Fans events out to Server-Sent Events subscribers by channel.
+
+    Publishing never blocks: each subscriber has a bounded queue and a slow
+    client loses its oldest events rather than holding up the publisher.
+    """
+    
+    def __init__(self, buffer: int = EVENT_STREAM_BUFFER):
+        self.buffer = buffer
+        self._subscribers = {}
+    
+    def publish(self, channel: str, event: dict):
+        for queue in self._subscribers.get(channel, ()):
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(event)
+    
+    async def stream(self, channel: str, snapshot=None):
+        """Yield SSE frames for channel until the client disconnects.
+
+        snapshot() is called after subscribing, so no change can slip in
+        between the initial state and the first pushed event.
+        """
+        queue = asyncio.Queue(self.buffer)
+        self._subscribers.setdefault(channel, set()).add(queue)
+        try:
+            if snapshot is not None:
+                yield sse_frame(snapshot())
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), EVENT_STREAM_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield sse_frame(event)
+        finally:
+            self._subscribers[channel].discard(queue)
+            if not self._subscribers[channel]:
+                del self._subscribers[channel]
+
+def sse_frame(event: dict) -> str:
+    return f"data: {json.dumps(event, default=json_default)}\n\n"
+
+def event_stream_response(channel: str, snapshot=None) -> StreamingResponse:
+    return StreamingResponse(
+        events.stream(channel, snapshot),
+        media_type="text/event-stream",
+        # Stop intermediaries from caching or buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+events = EventBroker()
 
 # WhatsApp Web automation functions
-def init_whatsapp_driver():
-    global driver
+# These are blocking, take the session's driver first, and must be called
+# through BrowserSession.run()
+MAIN_INTERFACE_XPATH = "//div[@data-testid='chat-list'] | //div[contains(@class, 'chat')] | //*[@id='main']"
+QR_CODE_XPATH = "//canvas[@aria-label='Scan me!'] | //div[contains(@class, 'qr')]"
+
+# Requests the lean profile never needs: media, and images other than the
+# QR code (which WhatsApp draws on a canvas)
+LEAN_BLOCKED_URLS = [
+    "*.jpg", "*.jpeg", "*.png", "*.gif", "*.webp",
+    "*.mp4", "*.webm", "*.ogg", "*.opus", "*.mp3",
+    "*pps.whatsapp.net/*",
+]
+
+# Major version reported when the browser's own can't be read
+FALLBACK_CHROME_MAJOR_VERSION = "120"
+
+@lru_cache(maxsize=None)
+def desktop_user_agent(binary: str) -> str:
+    """The user agent a regular desktop Chrome of the installed version sends"""
     try:
-        # Clean up any existing driver first
-        if driver:
-            try:
-                driver.quit()
-            except:
-                pass
-            driver = None
-        
-        chrome_options = Options()
-        chrome_options.add_argument("--no-sandbox")
-        chrome_options.add_argument("--disable-dev-shm-usage")
-        chrome_options.add_argument("--disable-gpu")
+        output = subprocess.run([binary, "--version"], capture_output=True, text=True, timeout=10).stdout
+        major = re.search(r"(\d+)\.\d+\.\d+\.\d+", output).group(1)
+    except (OSError, subprocess.SubprocessError, AttributeError):
+        logging.warning(f"Could not read the version of {binary}; assuming Chrome {FALLBACK_CHROME_MAJOR_VERSION}")
+        major = FALLBACK_CHROME_MAJOR_VERSION
+    # Chrome reports only its major version in the user agent
+    return (f"Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) "
+            f"Chrome/{major}.0.0.0 Safari/537.36")
+
+def lean_chrome_options(chrome_options: Options, profile_dir: str, binary: str):
+    chrome_options.add_argument("--headless=new")
+    # Headless Chrome announces itself as HeadlessChrome, which WhatsApp Web
+    # answers with its unsupported-browser page instead of the QR code
+    chrome_options.add_argument(f"--user-agent={desktop_user_agent(binary)}")
+    chrome_options.add_argument(f"--window-size={WHATSAPP_LEAN_WINDOW_SIZE}")
+    chrome_options.add_argument("--blink-settings=imagesEnabled=false")
+    chrome_options.add_argument("--mute-audio")
+    chrome_options.add_argument("--autoplay-policy=user-gesture-required")
+    # WhatsApp keeps a websocket alive from timers, so the tab must never be
+    # throttled even though nothing is ever visible
+    chrome_options.add_argument("--disable-background-timer-throttling")
+    chrome_options.add_argument("--disable-backgrounding-occluded-windows")
+    chrome_options.add_argument("--disable-renderer-backgrounding")
+    # Background services and UI a send worker never uses
+    chrome_options.add_argument("--disable-extensions")
+    chrome_options.add_argument("--disable-component-extensions-with-background-pages")
+    chrome_options.add_argument("--disable-default-apps")
+    chrome_options.add_argument("--disable-sync")
+    chrome_options.add_argument("--no-first-run")
+    chrome_options.add_argument("--no-default-browser-check")
+    chrome_options.add_argument("--disable-features=VizDisplayCompositor,Translate,MediaRouter,OptimizationHints")
+    # Keep the HTTP cache inside the persistent profile so the app shell and
+    # its scripts are reused across restarts instead of downloaded again
+    chrome_options.add_argument(f"--disk-cache-dir={os.path.join(profile_dir, 'cache')}")
+    chrome_options.add_argument(f"--disk-cache-size={WHATSAPP_DISK_CACHE_SIZE}")
+    chrome_options.add_experimental_option("prefs", {
+        "profile.managed_default_content_settings.images": 2,
+        "profile.default_content_setting_values.notifications": 2,
+    })
+
+def create_whatsapp_driver(profile_dir: str):
+    # Use chromium binary and chromedriver
+    binary = "/usr/bin/chromium"
+    chrome_options = Options()
+    chrome_options.add_argument("--no-sandbox")
+    chrome_options.add_argument("--disable-dev-shm-usage")
+    chrome_options.add_argument("--disable-gpu")
+    if WHATSAPP_DRIVER_PROFILE == "lean":
+        lean_chrome_options(chrome_options, profile_dir, binary)
+    else:
         chrome_options.add_argument("--window-size=1920,1080")
         # Remove headless mode so we can see WhatsApp Web
         # chrome_options.add_argument("--headless")
-        chrome_options.add_argument("--disable-web-security")
         chrome_options.add_argument("--disable-features=VizDisplayCompositor")
-        # Use the same user data directory as regular Chrome to access existing session
-        chrome_options.add_argument("--user-data-dir=/tmp/whatsapp-automation")
-        
-        # Use chromium binary and chromedriver
-        chrome_options.binary_location = "/usr/bin/chromium"
-        service = Service("/usr/bin/chromedriver")
-        
-        driver = webdriver.Chrome(service=service, options=chrome_options)
-        
-        # Navigate to WhatsApp Web
-        print("Opening WhatsApp Web...")
-        driver.get("https://web.whatsapp.com")
-        
-        # Wait for page to load
-        time.sleep(10)
-        
+    chrome_options.add_argument("--disable-web-security")
+    # Each session keeps its own profile so its WhatsApp link survives restarts
+    chrome_options.add_argument(f"--user-data-dir={profile_dir}")
+    
+    chrome_options.binary_location = binary
+    service = Service("/usr/bin/chromedriver")
+    
+    driver = webdriver.Chrome(service=service, options=chrome_options)
+    if WHATSAPP_DRIVER_PROFILE == "lean":
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": LEAN_BLOCKED_URLS})
+    
+    # Navigate to WhatsApp Web
+    print("Opening WhatsApp Web...")
+    driver.get("https://web.whatsapp.com")
+    
+    # Wait for the chat list or the QR code instead of a fixed sleep
+    try:
+        WebDriverWait(driver, WHATSAPP_STARTUP_TIMEOUT, poll_frequency=0.25).until(
+            lambda d: find_element_or_none(d, MAIN_INTERFACE_XPATH) or find_element_or_none(d, QR_CODE_XPATH)
+        )
         print("WhatsApp Web loaded successfully")
-        return True
-        
-    except Exception as e:
-        logging.error(f"Failed to initialize WhatsApp driver: {e}")
-        print(f"WhatsApp driver initialization error: {e}")
-        if driver:
+    except TimeoutException:
+        # Neither the QR code nor the chat list: slow, or WhatsApp refused this browser
+        logging.warning(f"WhatsApp Web showed neither a QR code nor the chat list after "
+                        f"{WHATSAPP_STARTUP_TIMEOUT:g}s (page title: {driver.title!r})")
+    return driver
+
+def browser_rss_bytes(driver) -> Optional[int]:
+    """Resident memory of chromedriver and every Chromium process under it (Linux /proc)"""
+    try:
+        root = driver.service.process.pid
+    except AttributeError:
+        return None
+    
+    children = {}
+    try:
+        for entry in os.listdir("/proc"):
+            if not entry.isdigit():
+                continue
             try:
-                driver.quit()
-            except:
-                pass
-            driver = None
-        return False
+                with open(f"/proc/{entry}/stat") as f:
+                    # ppid is the second field after the parenthesised command name
+                    ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+            children.setdefault(ppid, []).append(int(entry))
+    except OSError:
+        return None
+    
+    total, stack = 0, [root]
+    while stack:
+        pid = stack.pop()
+        stack.extend(children.get(pid, ()))
+        try:
+            with open(f"/proc/{pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1]) * 1024
+                        break
+        except OSError:
+            continue
+    return total
 
-def check_whatsapp_auth():
-    global driver, whatsapp_authenticated
+def check_whatsapp_auth(driver):
     try:
-        if not driver:
-            return False
-        
         # Check if we're on the chat interface (authenticated)
-        try:
-            driver.find_element(By.XPATH, "//div[@data-testid='chat-list']")
-            whatsapp_authenticated = True
-            return True
-        except NoSuchElementException:
-            whatsapp_authenticated = False
-            return False
-    except Exception:
+        driver.find_element(By.XPATH, "//div[@data-testid='chat-list']")
+        return True
+    except NoSuchElementException:
         return False
 
-def get_qr_code():
-    global driver
+def get_qr_code(driver):
     try:
-        if not driver:
-            return None
-        
         qr_element = driver.find_element(By.XPATH, "//canvas[@aria-label='Scan me!']")
         if qr_element:
             return qr_element.get_attribute("data-ref")
@@ -160,79 +676,1632 @@ def get_qr_code():
         pass
     return None
 
-async def send_whatsapp_message_real(phone: str, message: str) -> dict:
-    global driver
+def find_element_or_none(driver, xpath: str):
     try:
-        if not driver:
-            return {"success": False, "error": "WhatsApp driver not initialized"}
+        return driver.find_element(By.XPATH, xpath)
+    except Exception:
+        return None
+
+def sample_whatsapp_state(driver) -> dict:
+    """Read auth, QR and readiness off the current page in one browser-thread call"""
+    # check_whatsapp_auth only swallows NoSuchElementException, so a dead browser raises here
+    authenticated = check_whatsapp_auth(driver)
+    return {
+        "authenticated": authenticated,
+        "qr_available": not authenticated and find_element_or_none(driver, QR_CODE_XPATH) is not None,
+        "ready": authenticated or find_element_or_none(driver, MAIN_INTERFACE_XPATH) is not None,
+    }
+
+def open_url(driver, url: str):
+    driver.get(url)
+
+def click_element(driver, element):
+    driver.execute_script("arguments[0].click();", element)
+
+# Chat readiness is one combined condition polled until a single deadline:
+# whichever of these shows up first decides what happens next
+INVALID_NUMBER_XPATH = ("//*[@role='dialog' or @data-animate-modal-popup='true']"
+                        "//*[contains(text(), 'invalid') or contains(text(), 'not on WhatsApp')]")
+SEND_BUTTON_XPATH = " | ".join([
+    "//span[@data-testid='send']",
+    "//button[@data-testid='compose-btn-send']",
+    "//span[contains(@class, 'send')]//parent::button",
+    "//*[@aria-label='Send' or @data-icon='send']",
+    "//div[@role='button' and contains(@aria-label, 'Send')]",
+])
+COMPOSER_XPATH = "//div[@contenteditable='true' and @data-tab='10'] | //footer//div[@contenteditable='true']"
+# The open conversation; replaced whenever another chat opens
+CHAT_PANE_XPATH = "//*[@id='main']"
+CHAT_READY_STATES = (
+    ("invalid_number", INVALID_NUMBER_XPATH),
+    ("send_button", SEND_BUTTON_XPATH),
+    ("composer", COMPOSER_XPATH),
+)
+
+# Our own message bubbles, and the clock icon shown until the server accepts one
+OUTGOING_MESSAGE_XPATH = "//div[contains(@class, 'message-out')]"
+PENDING_MESSAGE_ICON_XPATH = ".//span[@data-icon='msg-time']"
+
+def chat_ready_state(driver, composer_needs_text: bool = False):
+    for state, xpath in CHAT_READY_STATES:
+        element = next((e for e in driver.find_elements(By.XPATH, xpath) if e.is_displayed()), None)
+        # A composer still waiting for its text is not ready to send yet
+        if element and (state != "composer" or not composer_needs_text or element.text.strip()):
+            return state, element
+    return False
+
+def wait_for_chat_ready(driver, timeout: float, composer_needs_text: bool = False):
+    """Return (state, element) for the first readiness state seen, or (None, None) at the deadline"""
+    try:
+        return WebDriverWait(
+            driver, timeout, poll_frequency=0.25, ignored_exceptions=(StaleElementReferenceException,)
+        ).until(partial(chat_ready_state, composer_needs_text=composer_needs_text))
+    except TimeoutException:
+        return None, None
+
+def message_fingerprint(text: str) -> str:
+    # Letters and digits only: bubbles render emoji as images and add a timestamp
+    return ''.join(ch for ch in text if ch.isalnum()).lower()
+
+def bubble_id(bubble) -> Optional[str]:
+    holder = bubble.find_elements(By.XPATH, "./ancestor-or-self::*[@data-id][1]")
+    return holder[0].get_attribute("data-id") if holder else None
+
+def last_outgoing_message_id(driver) -> Optional[str]:
+    bubbles = driver.find_elements(By.XPATH, OUTGOING_MESSAGE_XPATH)
+    return bubble_id(bubbles[-1]) if bubbles else None
+
+def wait_for_outgoing_message(driver, previous_id: Optional[str], message: str, timeout: float) -> bool:
+    """Wait for this message's own bubble to be the newest outgoing one and no longer pending.
+
+    Older bubbles still rendering after navigation don't count: the bubble
+    must differ from the newest one before the click and carry the message text.
+    """
+    expected = message_fingerprint(message)
+    
+    def delivered(d):
+        bubbles = d.find_elements(By.XPATH, OUTGOING_MESSAGE_XPATH)
+        if not bubbles:
+            return False
+        newest = bubbles[-1]
+        return (
+            (previous_id is None or bubble_id(newest) != previous_id)
+            and expected in message_fingerprint(newest.text)
+            and not newest.find_elements(By.XPATH, PENDING_MESSAGE_ICON_XPATH)
+        )
+    
+    try:
+        WebDriverWait(
+            driver, timeout, poll_frequency=0.25, ignored_exceptions=(StaleElementReferenceException,)
+        ).until(delivered)
+        return True
+    except TimeoutException:
+        return False
+
+def press_enter(driver, element):
+    element.send_keys(Keys.ENTER)
+
+# In-page navigation: WhatsApp Web handles wa.me links itself, so clicking one
+# injected into the app opens the chat without reloading the page
+OPEN_CHAT_SCRIPT = """
+const link = document.createElement('a');
+link.href = arguments[0];
+(document.querySelector('#app') || document.body).appendChild(link);
+link.click();
+link.remove();
+"""
+# execCommand goes through the composer's input handling and, unlike
+# send_keys, copes with emoji and newlines
+INSERT_TEXT_SCRIPT = """
+arguments[0].focus();
+document.execCommand('insertText', false, arguments[1]);
+"""
+
+def ensure_app_loaded(driver, timeout: float) -> bool:
+    """Load WhatsApp Web only if this tab isn't already showing the app"""
+    if driver.current_url.startswith("https://web.whatsapp.com") and find_element_or_none(driver, MAIN_INTERFACE_XPATH):
+        return True
+    driver.get("https://web.whatsapp.com")
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=0.25).until(
+            lambda d: find_element_or_none(d, MAIN_INTERFACE_XPATH)
+        )
+        return True
+    except TimeoutException:
+        return False
+
+def is_detached(element) -> bool:
+    try:
+        element.is_enabled()
+        return False
+    except StaleElementReferenceException:
+        return True
+
+def open_chat_in_page(driver, phone: str, timeout: float):
+    """Like wait_for_chat_ready, plus ("chat_not_closed", None) if the open chat won't close
+    and ("left_app", None) as soon as the browser navigates away instead of the app opening the chat"""
+    # Close the current chat first, and make sure its pane is gone, so its
+    # composer can't be mistaken for the new one and get the message
+    previous = find_element_or_none(driver, CHAT_PANE_XPATH)
+    ActionChains(driver).send_keys(Keys.ESCAPE).perform()
+    try:
+        WebDriverWait(driver, 2, poll_frequency=0.1).until(
+            lambda d: (previous is None or is_detached(previous)) and not d.find_elements(By.XPATH, COMPOSER_XPATH)
+        )
+    except TimeoutException:
+        return "chat_not_closed", None
+    
+    driver.execute_script(OPEN_CHAT_SCRIPT, f"https://wa.me/{phone.lstrip('+')}")
+    
+    def opened(d):
+        if not d.current_url.startswith("https://web.whatsapp.com"):
+            return "left_app", None
+        return chat_ready_state(d)
+    
+    try:
+        return WebDriverWait(
+            driver, timeout, poll_frequency=0.25, ignored_exceptions=(StaleElementReferenceException,)
+        ).until(opened)
+    except TimeoutException:
+        return None, None
+
+def insert_text(driver, element, text: str):
+    driver.execute_script(INSERT_TEXT_SCRIPT, element, text)
+
+# WhatsApp session pool
+class BrowserSession:
+    """One Chromium instance with its own profile, executor thread and auth state"""
+    
+    def __init__(self, index: int, profile_dir: str):
+        self.index = index
+        self.profile_dir = profile_dir
+        self.driver = None
+        self.executor = BrowserExecutor(f"browser-{index}")
+        self.authenticated = False
+        self.leased = False
+        self.sends = 0
+        self.consecutive_failures = 0
+        self.started_at = None
+        self.startup_seconds = None
+        self.in_page_navigation = SEND_NAVIGATION == "in_page"
+        # Last sampled page state, served to status endpoints without touching the browser
+        self.status = {"authenticated": False, "qr_available": False, "ready": False,
+                       "running": False, "checked_at": None}
+    
+    @property
+    def ready(self) -> bool:
+        return self.driver is not None and self.authenticated
+    
+    @property
+    def needs_recycle(self) -> bool:
+        return (self.sends >= SESSION_MAX_SENDS
+                or self.consecutive_failures >= SESSION_MAX_CONSECUTIVE_FAILURES)
+    
+    async def run(self, func, *args, **kwargs):
+        """Run func(driver, *args) on this session's browser thread"""
+        return await self.executor.run(func, self.driver, *args, **kwargs)
+    
+    def _quit(self):
+        if self.driver:
+            try:
+                self.driver.quit()
+            except:
+                pass
+            self.driver = None
+        self.authenticated = False
+    
+    def _start(self) -> bool:
+        # Clean up any existing driver first
+        self._quit()
+        began = time.perf_counter()
+        try:
+            self.driver = create_whatsapp_driver(self.profile_dir)
+        except Exception as e:
+            logging.error(f"Failed to initialize WhatsApp driver for session {self.index}: {e}")
+            print(f"WhatsApp driver initialization error: {e}")
+            self._quit()
+            return False
         
-        # Format phone number (remove + and spaces)
-        phone_clean = re.sub(r'[^\d]', '', phone)
-        if phone_clean.startswith('91') and len(phone_clean) > 10:
-            phone_clean = phone_clean[2:]  # Remove country code for URL
+        self.startup_seconds = round(time.perf_counter() - began, 2)
+        logging.info(f"WhatsApp session {self.index} started in {self.startup_seconds}s "
+                     f"({WHATSAPP_DRIVER_PROFILE} profile, {browser_rss_bytes(self.driver)} bytes RSS)")
+        self.started_at = datetime.utcnow()
+        self.sends = 0
+        self.consecutive_failures = 0
+        return True
+    
+    async def start(self) -> bool:
+        started = await self.executor.run(self._start)
+        try:
+            await self.sample()
+        except Exception as e:
+            logging.warning(f"Could not sample WhatsApp session {self.index} after start: {e}")
+        return started
+    
+    async def stop(self):
+        await self.executor.run(self._quit)
+        await self.sample()
+    
+    async def sample(self):
+        """Read the page state on the browser thread and cache it; raises if the browser has died"""
+        if self.driver:
+            state = await self.run(sample_whatsapp_state)
+        else:
+            state = {"authenticated": False, "qr_available": False, "ready": False}
+        self.record_status(state)
+    
+    def record_status(self, state: dict):
+        state = {**state, "running": self.driver is not None}
+        changed = any(self.status[key] != value for key, value in state.items())
+        self.authenticated = state["authenticated"]
+        self.status = {**state, "checked_at": datetime.utcnow()}
+        if changed:
+            events.publish(f"whatsapp_status:{self.index}", self.status_payload())
+    
+    def status_payload(self) -> dict:
+        status = self.status
+        if not status["running"]:
+            message = "Ready to connect. Click 'Connect WhatsApp' to open WhatsApp Web."
+        elif status["authenticated"]:
+            message = "✅ WhatsApp is connected and ready to send messages!"
+        else:
+            message = "📱 Please scan the QR code in WhatsApp Web to authenticate"
+        return WhatsAppStatus(
+            authenticated=status["authenticated"],
+            qr_available=status["qr_available"],
+            ready=status["ready"],
+            message=message,
+            session=self.index,
+            checked_at=status["checked_at"],
+        ).model_dump()
+    
+    def record_send(self, result: dict):
+        self.sends += 1
+        if result.get("success"):
+            self.consecutive_failures = 0
+        elif not result.get("permanent"):
+            # A number that isn't on WhatsApp says nothing about the browser
+            self.consecutive_failures += 1
+    
+    def describe(self) -> dict:
+        return {
+            "index": self.index,
+            "profile_dir": self.profile_dir,
+            "running": self.driver is not None,
+            "authenticated": self.authenticated,
+            "leased": self.leased,
+            "sends": self.sends,
+            "consecutive_failures": self.consecutive_failures,
+            "started_at": self.started_at,
+            "driver_profile": WHATSAPP_DRIVER_PROFILE,
+            "in_page_navigation": self.in_page_navigation,
+            "startup_seconds": self.startup_seconds,
+            "rss_bytes": browser_rss_bytes(self.driver) if self.driver else None,
+            "status": self.status,
+        }
+
+class SessionPool:
+    """Leases authenticated browser sessions to send workers, one worker per session at a time"""
+    
+    def __init__(self, size: int, profile_root: str):
+        # Session 0 keeps the original profile directory so an existing link still works
+        self.sessions = [
+            BrowserSession(index, profile_root if index == 0 else f"{profile_root}-{index}")
+            for index in range(size)
+        ]
+        self._available = None
+        self._health_tasks = []
+    
+    @property
+    def primary(self) -> BrowserSession:
+        return self.sessions[0]
+    
+    def _condition(self) -> asyncio.Condition:
+        # Created lazily so it binds to the running event loop
+        if self._available is None:
+            self._available = asyncio.Condition()
+        return self._available
+    
+    async def notify(self):
+        async with self._condition():
+            self._condition().notify_all()
+    
+    @asynccontextmanager
+    async def lease(self):
+        """Wait for a ready, idle session and hold it for the duration of the block"""
+        async with self._condition():
+            while True:
+                session = next((s for s in self.sessions if s.ready and not s.leased), None)
+                if session:
+                    break
+                await self._condition().wait()
+            session.leased = True
         
-        # Create WhatsApp Web URL with message
-        encoded_message = quote(message)
-        url = f"https://web.whatsapp.com/send?phone=91{phone_clean}&text={encoded_message}"
+        try:
+            yield session
+        finally:
+            if session.needs_recycle:
+                logging.info(f"Recycling WhatsApp session {session.index} after {session.sends} sends")
+                await session.start()
+            session.leased = False
+            await self.notify()
+    
+    async def health_check(self, session: BrowserSession):
+        """Sample an idle session's page state and restart it if its browser has died"""
+        if session.leased or session.driver is None:
+            return
+        try:
+            await session.sample()
+        except Exception as e:
+            logging.warning(f"WhatsApp session {session.index} failed its health check, restarting: {e}")
+            await session.start()
+        await self.notify()
+    
+    def start_health_checks(self):
+        # One monitor per session so a slow browser never delays another's status
+        self._health_tasks = [
+            asyncio.create_task(self.run_health_checks(session)) for session in self.sessions
+        ]
+    
+    async def run_health_checks(self, session: BrowserSession):
+        while True:
+            await asyncio.sleep(SESSION_STATUS_INTERVAL)
+            try:
+                await self.health_check(session)
+            except Exception as e:
+                logging.error(f"WhatsApp session {session.index} health check failed: {e}")
+    
+    async def stop(self):
+        for task in self._health_tasks:
+            task.cancel()
+        for session in self.sessions:
+            await session.stop()
+
+session_pool = SessionPool(WHATSAPP_SESSIONS, WHATSAPP_PROFILE_ROOT)
+
+async def submit_and_confirm(session: BrowserSession, state: str, element, message: str) -> dict:
+    """Send whatever is in the composer and wait for the message's outgoing bubble"""
+    previous_id = await session.run(last_outgoing_message_id)
+    # From the click on, the message may be on its way: every failure is
+    # reported as unconfirmed so nothing upstream sends it again
+    try:
+        with SELENIUM_STEP_SECONDS.time(step="click_send"):
+            if state == "send_button":
+                await session.run(click_element, element)
+            else:
+                # Message is in the composer but no send control was found; Enter sends it
+                await session.run(press_enter, element)
         
-        print(f"Navigating to: {url}")
-        driver.get(url)
+        with SELENIUM_STEP_SECONDS.time(step="wait_for_sent"):
+            confirmed = await session.run(wait_for_outgoing_message, previous_id, message, SEND_CONFIRM_TIMEOUT)
+    except Exception as e:
+        return {"success": False, "unconfirmed": True, "error": f"Send may have been submitted: {e}"}
+    if not confirmed:
+        # The message was submitted and may well arrive; sending it again could
+        # deliver it twice, so this is never retried automatically
+        return {"success": False, "unconfirmed": True,
+                "error": f"Sent message not confirmed within {SEND_CONFIRM_TIMEOUT:g}s"}
+    return {"success": True}
+
+async def send_in_page(session: BrowserSession, phone: str, message: str) -> dict:
+    """Open the chat inside the already loaded app and type the message into the composer"""
+    with SELENIUM_STEP_SECONDS.time(step="load_app"):
+        loaded = await session.run(ensure_app_loaded, SEND_READY_TIMEOUT)
+    if not loaded:
+        return {"success": False, "error": "WhatsApp Web did not load"}
+    
+    with SELENIUM_STEP_SECONDS.time(step="navigate_in_page"):
+        state, element = await session.run(open_chat_in_page, phone, SEND_READY_TIMEOUT)
+    if state is None:
+        return {"success": False, "error": f"Chat did not open within {SEND_READY_TIMEOUT:g}s"}
+    if state == "chat_not_closed":
+        return {"success": False, "error": "Previous chat did not close"}
+    if state == "left_app":
+        # The app didn't handle the link; trying again would only repeat the detour
+        session.in_page_navigation = False
+        return {"success": False, "error": "Chat link left WhatsApp Web; using page reloads from now on"}
+    if state == "invalid_number":
+        # Retrying will not help; the queue fails this message immediately
+        return {"success": False, "error": "Phone number is not on WhatsApp", "permanent": True}
+    
+    with SELENIUM_STEP_SECONDS.time(step="type_message"):
+        await session.run(insert_text, element, message)
+    
+    # With text in the composer the send control appears
+    with SELENIUM_STEP_SECONDS.time(step="wait_for_send_button"):
+        state, element = await session.run(wait_for_chat_ready, SEND_READY_TIMEOUT, composer_needs_text=True)
+    if state is None:
+        return {"success": False, "error": "Composer disappeared before sending"}
+    return await submit_and_confirm(session, state, element, message)
+
+async def send_with_reload(session: BrowserSession, phone: str, message: str) -> dict:
+    """Navigate to the send URL, reloading the whole app"""
+    # Create WhatsApp Web URL with message (phone is stored in E.164 at ingest)
+    encoded_message = quote(message)
+    url = f"https://web.whatsapp.com/send?phone={phone.lstrip('+')}&text={encoded_message}"
+    
+    print(f"Navigating to: {url}")
+    with SELENIUM_STEP_SECONDS.time(step="navigate_reload"):
+        await session.run(open_url, url)
+    
+    # Wait only as long as the page needs, up to one overall deadline; the
+    # composer shows up before the prefilled text, and Enter on it would send nothing
+    with SELENIUM_STEP_SECONDS.time(step="wait_for_send_button"):
+        state, element = await session.run(wait_for_chat_ready, SEND_READY_TIMEOUT, composer_needs_text=True)
+    if state is None:
+        return {"success": False, "error": f"Chat did not load within {SEND_READY_TIMEOUT:g}s"}
+    if state == "invalid_number":
+        # Retrying will not help; the queue fails this message immediately
+        return {"success": False, "error": "Phone number is not on WhatsApp", "permanent": True}
+    return await submit_and_confirm(session, state, element, message)
+
+async def send_whatsapp_message_real(phone: str, message: str, session: Optional[BrowserSession] = None) -> dict:
+    session = session or session_pool.primary
+    try:
+        if not session.driver:
+            return {"success": False, "error": "WhatsApp driver not initialized"}
         
-        # Wait for page to load
-        await asyncio.sleep(5)
+        if session.in_page_navigation:
+            try:
+                result = await send_in_page(session, phone, message)
+            except Exception as e:
+                result = {"success": False, "error": str(e)}
+            if result["success"] or result.get("permanent") or result.get("unconfirmed"):
+                return result
+            # Full page load is the recovery path when in-page navigation fails
+            # before anything was submitted
+            logging.warning(f"In-page send to {phone} failed ({result['error']}), retrying with a page reload")
         
+        return await send_with_reload(session, phone, message)
+    
+    except Exception as e:
+        print(f"Error in send_whatsapp_message_real: {e}")
+        return {"success": False, "error": str(e)}
+
+# Message transports
+# The send queue only talks to a transport: lease() holds one channel (a
+# browser session, or a simulated one) for a single send, and send() returns
+# {"success", "error"} plus optionally "permanent" (don't retry),
+# "unconfirmed" (submitted but not confirmed; never resend) or
+# "retry_after" (throttled; retry after that many seconds).
+class MessageTransport(ABC):
+    name = "base"
+    
+    @property
+    @abstractmethod
+    def channels(self) -> int:
+        """Number of channels, and so of send workers"""
+    
+    @abstractmethod
+    def lease(self):
+        """Async context manager holding one idle channel"""
+    
+    @abstractmethod
+    async def send(self, channel, phone: str, message: str) -> dict:
+        """Send one message through a leased channel"""
+    
+    def describe(self) -> dict:
+        return {"transport": self.name, "workers": self.channels}
+
+class SeleniumTransport(MessageTransport):
+    """Sends through the WhatsApp Web browser sessions"""
+    name = "selenium"
+    
+    def __init__(self, pool: SessionPool):
+        self.pool = pool
+    
+    @property
+    def channels(self) -> int:
+        return len(self.pool.sessions)
+    
+    def lease(self):
+        return self.pool.lease()
+    
+    async def send(self, session: BrowserSession, phone: str, message: str) -> dict:
+        result = await send_whatsapp_message_real(phone, message, session)
+        session.record_send(result)
+        return result
+    
+    def describe(self) -> dict:
+        return {
+            **super().describe(),
+            "ready_sessions": sum(1 for session in self.pool.sessions if session.ready),
+        }
+
+class MockChannel:
+    def __init__(self, index: int):
+        self.index = index
+
+class MockTransport(MessageTransport):
+    """In-process WhatsApp stand-in; nothing leaves the process"""
+    name = "mock"
+    
+    def __init__(self, channels: int = MOCK_TRANSPORT_CHANNELS, latency: float = MOCK_TRANSPORT_LATENCY,
+                 jitter: float = MOCK_TRANSPORT_JITTER, failure_rate: float = MOCK_TRANSPORT_FAILURE_RATE,
+                 invalid_rate: float = MOCK_TRANSPORT_INVALID_RATE,
+                 rate_limit_rate: float = MOCK_TRANSPORT_RATE_LIMIT_RATE,
+                 retry_after: float = MOCK_TRANSPORT_RETRY_AFTER, seed: Optional[str] = MOCK_TRANSPORT_SEED):
+        self._channels = [MockChannel(index) for index in range(channels)]
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.invalid_rate = invalid_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.outcomes = dict.fromkeys(("sent", "failed", "invalid", "rate_limited"), 0)
+        self._free = None
+    
+    @property
+    def channels(self) -> int:
+        return len(self._channels)
+    
+    def _queue(self) -> asyncio.Queue:
+        # Created lazily so it binds to the running event loop
+        if self._free is None:
+            self._free = asyncio.Queue()
+            for channel in self._channels:
+                self._free.put_nowait(channel)
+        return self._free
+    
+    @asynccontextmanager
+    async def lease(self):
+        channel = await self._queue().get()
         try:
-            # Wait for and find the send button with multiple selectors
-            send_selectors = [
-                "//span[@data-testid='send']",
-                "//button[@data-testid='compose-btn-send']", 
-                "//span[contains(@class, 'send')]//parent::button",
-                "//*[@aria-label='Send' or @data-icon='send']",
-                "//div[@role='button' and contains(@aria-label, 'Send')]"
+            yield channel
+        finally:
+            self._queue().put_nowait(channel)
+    
+    async def send(self, channel: MockChannel, phone: str, message: str) -> dict:
+        await asyncio.sleep(max(0.0, self.random.gauss(self.latency, self.jitter)))
+        
+        roll = self.random.random()
+        if roll < self.rate_limit_rate:
+            self.outcomes["rate_limited"] += 1
+            return {"success": False, "error": "Rate limited (mock)", "retry_after": self.retry_after}
+        roll -= self.rate_limit_rate
+        if roll < self.invalid_rate:
+            self.outcomes["invalid"] += 1
+            return {"success": False, "error": "Phone number is not on WhatsApp (mock)", "permanent": True}
+        roll -= self.invalid_rate
+        if roll < self.failure_rate:
+            self.outcomes["failed"] += 1
+            return {"success": False, "error": "Send failed (mock)"}
+        
+        self.outcomes["sent"] += 1
+        return {"success": True}
+    
+    def describe(self) -> dict:
+        return {
+            **super().describe(),
+            "ready_sessions": self.channels,
+            "mock": {
+                "latency": self.latency,
+                "jitter": self.jitter,
+                "failure_rate": self.failure_rate,
+                "invalid_rate": self.invalid_rate,
+                "rate_limit_rate": self.rate_limit_rate,
+                "retry_after": self.retry_after,
+                "outcomes": dict(self.outcomes),
+            },
+        }
+
+def create_transport(name: str) -> MessageTransport:
+    if name == "selenium":
+        return SeleniumTransport(session_pool)
+    if name == "mock":
+        return MockTransport()
+    raise ValueError(f"Unknown SEND_TRANSPORT {name!r}; expected 'selenium' or 'mock'")
+
+# Send queue
+# message_logs doubles as a persistent job queue: send-bulk with auto_send
+# writes 'pending' logs, workers claim them atomically ('sending') and finish
+# them as 'sent', or back to 'pending' with a backoff, or 'failed' for good.
+# A message submitted in the browser whose bubble never confirmed ends as
+# 'unconfirmed' and is left for an operator rather than sent again.
+# A claim that outlives SEND_CLAIM_TIMEOUT (worker crashed mid-send) is
+# returned to 'pending', so delivery is at-least-once.
+class TokenBucket:
+    """Allows `rate` acquisitions per `period` seconds with bursts of up to `capacity`"""
+    
+    def __init__(self, rate: float, period: float = 60.0, capacity: float = 1.0):
+        self.fill_rate = rate / period
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+    
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.fill_rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.fill_rate)
+
+class SendProgress:
+    """Live counters per bulk run, fed by the send path and pushed as events.
+
+    Every message state change is published on the run's channel and on the
+    'send_progress' firehose, followed by the run's updated counters. A run
+    stays open while send-bulk is still writing it; once closed with nothing
+    left to send it is dropped from memory, and asking for it later rebuilds
+    its counters from message_logs.
+    """
+    
+    STATUSES = ("pending", "sending", "sent", "failed", "unconfirmed", "ready_for_batch_send")
+    
+    def __init__(self):
+        self.runs = {}
+    
+    def _new_run(self, campaign_id: str, counts: Optional[dict] = None) -> dict:
+        return {
+            "campaign_id": campaign_id,
+            "counts": {**dict.fromkeys(self.STATUSES, 0), **(counts or {})},
+            "completions": deque(maxlen=SEND_PROGRESS_RATE_WINDOW),
+            "open": False,
+        }
+    
+    async def load(self, campaign_id: str) -> Optional[dict]:
+        """Current counters for a run, rebuilt from message_logs if it isn't tracked"""
+        if campaign_id not in self.runs:
+            pipeline = [
+                {"$match": {"campaign_id": campaign_id}},
+                {"$group": {"_id": "$status", "count": {"$sum": 1}}},
             ]
+            counts = {doc["_id"]: doc["count"] async for doc in db.message_logs.aggregate(pipeline)}
+            if not counts:
+                return None
+            run = self._new_run(campaign_id, counts)
+            summary = self._summarize(run)
+            if not summary["finished"]:
+                # Still being sent by another process or a previous run of this one
+                self.runs.setdefault(campaign_id, run)
+            return summary
+        return self.summary(campaign_id)
+    
+    def register(self, campaign_id: str, counts: Dict[str, int]):
+        """Add a chunk of newly written logs to a run, before the workers can claim them"""
+        run = self.runs.setdefault(campaign_id, self._new_run(campaign_id))
+        run["open"] = True
+        for status, count in counts.items():
+            run["counts"][status] = run["counts"].get(status, 0) + count
+        self._publish_summary(campaign_id)
+    
+    def close(self, campaign_id: str):
+        """send-bulk has written every log of the run"""
+        run = self.runs.get(campaign_id)
+        if run:
+            run["open"] = False
+            self._publish_summary(campaign_id)
+    
+    def transition(self, log: dict, status: str, error: Optional[str] = None):
+        """Record one message moving from log['status'] to status"""
+        campaign_id = log.get("campaign_id")
+        event = {
+            "type": "message",
+            "campaign_id": campaign_id,
+            "message_id": log["id"],
+            "contact_id": log.get("contact_id"),
+            "phone": log.get("phone"),
+            "status": status,
+            "previous_status": log["status"],
+            "attempts": log.get("attempts", 0),
+            "error": error,
+            "at": datetime.utcnow(),
+        }
+        events.publish("send_progress", event)
+        if not campaign_id:
+            return
+        events.publish(f"send_progress:{campaign_id}", event)
+        
+        run = self.runs.get(campaign_id)
+        if run:
+            counts = run["counts"]
+            counts[log["status"]] = max(counts.get(log["status"], 0) - 1, 0)
+            counts[status] = counts.get(status, 0) + 1
+            if status in ("sent", "failed", "unconfirmed"):
+                run["completions"].append(time.monotonic())
+        self._publish_summary(campaign_id)
+    
+    def summary(self, campaign_id: str) -> Optional[dict]:
+        run = self.runs.get(campaign_id)
+        return self._summarize(run) if run else None
+    
+    def _summarize(self, run: dict) -> dict:
+        counts = run["counts"]
+        remaining = counts["pending"] + counts["sending"]
+        
+        # Rate over the most recent completions so the ETA follows the current pace
+        completions = run["completions"]
+        rate = None
+        if len(completions) >= 2 and completions[-1] > completions[0]:
+            rate = (len(completions) - 1) / (completions[-1] - completions[0]) * 60
+        
+        return {
+            "type": "progress",
+            "campaign_id": run["campaign_id"],
+            "total": sum(counts.values()),
+            "queued": counts["pending"],
+            "sending": counts["sending"],
+            "sent": counts["sent"],
+            "failed": counts["failed"],
+            "unconfirmed": counts["unconfirmed"],
+            "prepared": counts["ready_for_batch_send"],
+            "rate_per_minute": round(rate, 2) if rate else None,
+            "eta_seconds": round(remaining / rate * 60) if rate and remaining else (0 if not remaining else None),
+            "finished": remaining == 0 and not run["open"],
+            "at": datetime.utcnow(),
+        }
+    
+    def _publish_summary(self, campaign_id: str):
+        summary = self.summary(campaign_id)
+        if summary is None:
+            return
+        events.publish("send_progress", summary)
+        events.publish(f"send_progress:{campaign_id}", summary)
+        if summary["finished"]:
+            del self.runs[campaign_id]
+            schedule_campaign_refresh(campaign_id)
+
+send_progress = SendProgress()
+
+def send_outcome(result: dict) -> str:
+    if result.get("success"):
+        return "sent"
+    if result.get("retry_after") is not None:
+        return "rate_limited"
+    if result.get("unconfirmed"):
+        return "unconfirmed"
+    return "permanent_failure" if result.get("permanent") else "failure"
+
+class SendQueue:
+    """Send workers draining pending message_logs through leased transport channels"""
+    
+    def __init__(self, transport: MessageTransport):
+        self.transport = transport
+        self.worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.rate_limits = {
+            index: TokenBucket(SEND_RATE_PER_MINUTE, 60.0, SEND_RATE_BURST)
+            for index in range(transport.channels)
+        }
+        self._tasks = []
+    
+    async def claim(self, session_index: int) -> Optional[dict]:
+        now = datetime.utcnow()
+        with MONGO_WRITE_SECONDS.time(operation="queue_claim"):
+            log = await db.message_logs.find_one_and_update(
+                {"status": "pending", "next_attempt_at": {"$lte": now}},
+                {
+                    "$set": {"status": "sending", "claimed_at": now, "claimed_by": f"{self.worker_id}/{session_index}"},
+                    "$inc": {"attempts": 1},
+                },
+                sort=[("next_attempt_at", ASCENDING)],
+                return_document=ReturnDocument.AFTER,
+            )
+        if log:
+            send_progress.transition({**log, "status": "pending"}, "sending")
+        return log
+    
+    async def complete(self, log: dict, result: dict):
+        changes = {}
+        if result.get("success"):
+            update = {"status": "sent", "sent_at": datetime.utcnow(), "error_message": None}
+        elif result.get("unconfirmed"):
+            update = {"status": "unconfirmed", "error_message": result.get("error")}
+        elif result.get("retry_after") is not None:
+            # Throttled rather than failed: wait as asked and give the attempt back
+            update = {
+                "status": "pending",
+                "next_attempt_at": datetime.utcnow() + timedelta(seconds=result["retry_after"]),
+                "error_message": result.get("error"),
+            }
+            changes["$inc"] = {"attempts": -1}
+        elif log["attempts"] < SEND_MAX_ATTEMPTS and not result.get("permanent"):
+            backoff = min(SEND_RETRY_BACKOFF * 2 ** (log["attempts"] - 1), SEND_RETRY_BACKOFF_MAX)
+            update = {
+                "status": "pending",
+                "next_attempt_at": datetime.utcnow() + timedelta(seconds=backoff),
+                "error_message": result.get("error"),
+            }
+        else:
+            update = {"status": "failed", "error_message": result.get("error")}
+        
+        # Only the claim holder may finish the job; a reclaimed job belongs to someone else now
+        with MONGO_WRITE_SECONDS.time(operation="queue_complete"):
+            result = await db.message_logs.update_one(
+                {"id": log["id"], "status": "sending", "claimed_by": log["claimed_by"]},
+                {"$set": {**update, "claimed_at": None, "claimed_by": None}, **changes}
+            )
+        if result.modified_count:
+            send_progress.transition(log, update["status"], update["error_message"])
+    
+    async def reclaim_stale(self) -> int:
+        cutoff = datetime.utcnow() - timedelta(seconds=SEND_CLAIM_TIMEOUT)
+        stale = db.message_logs.find(
+            {"status": "sending", "claimed_at": {"$lt": cutoff}},
+            {"_id": 0, "id": 1, "contact_id": 1, "phone": 1, "status": 1, "attempts": 1,
+             "claimed_by": 1, "campaign_id": 1}
+        )
+        # One guarded update per message so each requeue is reported exactly once
+        reclaimed = 0
+        async for log in stale:
+            result = await db.message_logs.update_one(
+                {"id": log["id"], "status": "sending", "claimed_by": log["claimed_by"]},
+                {"$set": {"status": "pending", "next_attempt_at": datetime.utcnow(), "claimed_at": None, "claimed_by": None}}
+            )
+            if result.modified_count:
+                reclaimed += 1
+                send_progress.transition(log, "pending", "Send claim timed out")
+        if reclaimed:
+            logging.warning(f"Returned {reclaimed} stale sending messages to the queue")
+        return reclaimed
+    
+    async def run_worker(self):
+        while True:
+            try:
+                async with self.transport.lease() as channel:
+                    # Claim before taking a token so an idle poll hands the channel
+                    # straight back (health checks skip leased sessions); the token
+                    # wait, at most one rate period, is far inside SEND_CLAIM_TIMEOUT
+                    log = await self.claim(channel.index)
+                    if log:
+                        await self.rate_limits[channel.index].acquire()
+                        result = await self.transport.send(channel, log["phone"], log["message"])
+                        SEND_RESULTS.inc(transport=self.transport.name, outcome=send_outcome(result))
+                        await self.complete(log, result)
+                if not log:
+                    await asyncio.sleep(SEND_QUEUE_POLL_INTERVAL)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Send worker error: {e}")
+                await asyncio.sleep(SEND_QUEUE_POLL_INTERVAL)
+    
+    async def run_reclaimer(self):
+        while True:
+            try:
+                await self.reclaim_stale()
+            except Exception as e:
+                logging.error(f"Send queue reclaim failed: {e}")
+            await asyncio.sleep(SEND_CLAIM_TIMEOUT / 2)
+    
+    def start(self):
+        # One worker per channel; each holds its channel only while sending
+        self._tasks = [asyncio.create_task(self.run_worker()) for _ in range(self.transport.channels)]
+        self._tasks.append(asyncio.create_task(self.run_reclaimer()))
+    
+    def stop(self):
+        for task in self._tasks:
+            task.cancel()
+
+send_queue = SendQueue(create_transport(SEND_TRANSPORT))
+
+# Campaigns
+# Each send-bulk run is a campaign; its summary document caches counts,
+# success rate and latency percentiles computed from its message logs.
+def campaign_latency_pipeline(campaign_id: str, ranks: List[int]) -> List[dict]:
+    # Number the sent messages by latency and keep only the ranks asked for;
+    # the sort streams (spilling to disk if large) instead of building one
+    # array of every latency, so a campaign of any size returns a few documents
+    return [
+        {"$match": {"campaign_id": campaign_id, "status": "sent", "sent_at": {"$ne": None}}},
+        {"$project": {"_id": 0, "latency": {"$subtract": ["$sent_at", "$created_at"]}}},
+        {"$setWindowFields": {"sortBy": {"latency": 1}, "output": {"rank": {"$documentNumber": {}}}}},
+        {"$match": {"rank": {"$in": ranks}}},
+    ]
+
+async def campaign_latency_percentiles(campaign_id: str) -> Dict[int, float]:
+    """Nearest-rank send latency percentiles in seconds, keyed by percentile"""
+    sent = await db.message_logs.count_documents(
+        {"campaign_id": campaign_id, "status": "sent", "sent_at": {"$ne": None}}
+    )
+    if not sent:
+        return {}
+    ranks = {p: int((sent - 1) * p / 100) + 1 for p in CAMPAIGN_LATENCY_PERCENTILES}
+    try:
+        cursor = db.message_logs.aggregate(
+            campaign_latency_pipeline(campaign_id, sorted(set(ranks.values()))), allowDiskUse=True
+        )
+        # $subtract on two dates gives milliseconds
+        latencies = {doc["rank"]: doc["latency"] / 1000 async for doc in cursor}
+    except (OperationFailure, NotImplementedError) as e:
+        # $setWindowFields needs MongoDB 5.0; the benchmark's in-memory backend lacks it too
+        logging.warning(f"Could not compute latency percentiles for campaign {campaign_id}: {e}")
+        return {}
+    return {p: round(latencies[rank], 3) for p, rank in ranks.items() if rank in latencies}
+
+async def refresh_campaign_stats(campaign_id: str) -> Optional[dict]:
+    """Recompute a campaign's summary and mark it completed once nothing is left to send"""
+    pipeline = [
+        {"$match": {"campaign_id": campaign_id}},
+        {"$group": {"_id": "$status", "count": {"$sum": 1}}},
+    ]
+    counts = {doc["_id"]: doc["count"] async for doc in db.message_logs.aggregate(pipeline)}
+    latency = await campaign_latency_percentiles(campaign_id)
+    
+    sent, failed = counts.get("sent", 0), counts.get("failed", 0)
+    now = datetime.utcnow()
+    stats = {
+        "total": sum(counts.values()),
+        "counts": counts,
+        "success_rate": round(sent / (sent + failed), 4) if sent + failed else None,
+        "computed_at": now,
+    }
+    for p in CAMPAIGN_LATENCY_PERCENTILES:
+        stats[f"latency_p{p}"] = latency.get(p)
+    
+    update = {"stats": stats}
+    campaign = await db.campaigns.find_one({"id": campaign_id}, {"_id": 0, "status": 1})
+    if campaign and campaign["status"] == "sending" and not counts.get("pending") and not counts.get("sending"):
+        update.update(status="completed", completed_at=now)
+    
+    return await db.campaigns.find_one_and_update(
+        {"id": campaign_id}, {"$set": update},
+        projection={"_id": 0}, return_document=ReturnDocument.AFTER
+    )
+
+def schedule_campaign_refresh(campaign_id: str):
+    task = asyncio.create_task(refresh_campaign_stats(campaign_id))
+    campaign_tasks.add(task)
+    task.add_done_callback(campaign_tasks.discard)
+
+async def get_campaign_summary(campaign_id: str) -> Optional[dict]:
+    campaign = await db.campaigns.find_one({"id": campaign_id}, {"_id": 0})
+    if campaign is None or campaign["status"] in ("completed", "failed"):
+        return campaign
+    computed_at = campaign["stats"].get("computed_at")
+    if computed_at is None or datetime.utcnow() - computed_at > timedelta(seconds=CAMPAIGN_STATS_TTL):
+        campaign = await refresh_campaign_stats(campaign_id)
+    return campaign
+
+# Phone normalization
+# Reasons a phone number is rejected at ingest
+PHONE_EMPTY = "empty"
+PHONE_INVALID_CHARACTERS = "invalid_characters"
+PHONE_TOO_SHORT = "too_short"
+PHONE_TOO_LONG = "too_long"
+PHONE_INVALID_COUNTRY_CODE = "invalid_country_code"
+
+# Separators allowed inside a phone number besides digits and a leading '+'
+PHONE_SEPARATORS = frozenset(" -.()/")
+E164_MIN_DIGITS = 8
+E164_MAX_DIGITS = 15
+
+def phone_reject_reason(digits: str) -> Optional[str]:
+    if len(digits) < E164_MIN_DIGITS:
+        return PHONE_TOO_SHORT
+    if len(digits) > E164_MAX_DIGITS:
+        return PHONE_TOO_LONG
+    if digits[0] == '0':
+        return PHONE_INVALID_COUNTRY_CODE
+    return None
+
+def normalize_phone(raw: str, default_country_code: str = DEFAULT_COUNTRY_CODE):
+    """Return (e164, None) for a valid phone number or (None, reason) for an invalid one"""
+    raw = (raw or '').strip()
+    if not raw:
+        return None, PHONE_EMPTY
+    
+    international = raw.startswith('+')
+    body = raw[1:] if international else raw
+    if any(not '0' <= ch <= '9' and ch not in PHONE_SEPARATORS for ch in body):
+        return None, PHONE_INVALID_CHARACTERS
+    
+    digits = ''.join(ch for ch in body if '0' <= ch <= '9')
+    if not digits:
+        return None, PHONE_EMPTY
+    
+    if not international:
+        if digits.startswith('00'):
+            # 00 international dialing prefix
+            digits = digits[2:]
+        elif len(digits) == NATIONAL_NUMBER_LENGTH + 1 and digits[0] == '0':
+            # National number with a trunk prefix, e.g. 09876543210
+            digits = default_country_code + digits[1:]
+        elif len(digits) == NATIONAL_NUMBER_LENGTH:
+            digits = default_country_code + digits
+    
+    reason = phone_reject_reason(digits)
+    if reason:
+        return None, reason
+    return f"+{digits}", None
+
+def normalize_phone_column(values: List[str], default_country_code: str = DEFAULT_COUNTRY_CODE):
+    """Vectorized normalize_phone over a whole column; returns (numbers, reasons) lists"""
+    if not values:
+        return [], []
+    
+    stripped = np.strings.strip(np.asarray(values, dtype=str))
+    try:
+        encoded = stripped.astype(bytes)
+    except UnicodeEncodeError:
+        # Non-ASCII input can't use the byte matrix below
+        results = [normalize_phone(value, default_country_code) for value in values]
+        return [number for number, _ in results], [reason for _, reason in results]
+    
+    width = max(encoded.dtype.itemsize, 1)
+    chars = np.frombuffer(encoded.tobytes(), dtype=np.uint8).reshape(len(values), width)
+    
+    # Padding is whatever lies past each value's own length; numpy drops
+    # trailing NULs, so a value longer than its stored form ended in one
+    lengths = np.fromiter((len(value.strip()) for value in values), dtype=np.int64, count=len(values))
+    padding = np.arange(width) >= lengths[:, None]
+    truncated = lengths > np.strings.str_len(stripped)
+    
+    international = chars[:, 0] == ord('+')
+    is_digit = (chars >= ord('0')) & (chars <= ord('9'))
+    allowed = is_digit | np.isin(chars, np.frombuffer("".join(PHONE_SEPARATORS).encode(), dtype=np.uint8)) | padding
+    allowed[:, 0] |= international
+    invalid_characters = ~allowed.all(axis=1) | truncated
+    
+    # Pack every row's digits to the left, preserving their order
+    order = np.argsort(~is_digit, axis=1, kind='stable')
+    digits = np.take_along_axis(chars, order, axis=1)
+    digit_count = is_digit.sum(axis=1)
+    
+    first, second = digits[:, 0], digits[:, 1] if width > 1 else np.zeros(len(values), dtype=np.uint8)
+    national = ~international
+    dialing_prefix = national & (first == ord('0')) & (second == ord('0')) & (digit_count >= 2)
+    trunk_prefix = national & ~dialing_prefix & (digit_count == NATIONAL_NUMBER_LENGTH + 1) & (first == ord('0'))
+    add_country_code = trunk_prefix | (national & ~dialing_prefix & (digit_count == NATIONAL_NUMBER_LENGTH))
+    
+    # Drop the dialing or trunk prefix and clear everything after the digits
+    shift = np.where(dialing_prefix, 2, np.where(trunk_prefix, 1, 0))
+    length = digit_count - shift
+    columns = np.arange(width)
+    digits = np.take_along_axis(digits, np.minimum(columns + shift[:, None], width - 1), axis=1)
+    digits[columns >= length[:, None]] = 0
+    
+    numbers = np.strings.add(
+        np.where(add_country_code, f"+{default_country_code}".encode(), b"+"),
+        digits.reshape(-1).view(f"S{width}")
+    )
+    total = length + np.where(add_country_code, len(default_country_code), 0)
+    leading_digit = np.where(add_country_code, ord(default_country_code[0]), digits[:, 0])
+    
+    reasons = np.select(
+        [invalid_characters, digit_count == 0, total < E164_MIN_DIGITS, total > E164_MAX_DIGITS, leading_digit == ord('0')],
+        [PHONE_INVALID_CHARACTERS, PHONE_EMPTY, PHONE_TOO_SHORT, PHONE_TOO_LONG, PHONE_INVALID_COUNTRY_CODE],
+        default=""
+    )
+    numbers = np.where(reasons == "", numbers.astype(str), "")
+    return [number or None for number in numbers.tolist()], [reason or None for reason in reasons.tolist()]
+
+# Index management
+async def migrate_contact_phones() -> dict:
+    """Normalize stored phones to E.164 and merge contacts that share one, so phone_unique can be built.
+
+    Runs once: a database that already has phone_unique cannot hold duplicates,
+    and every write since then stores normalized phones.
+    """
+    counts = {"normalized": 0, "invalid": 0, "merged": 0}
+    if "phone_unique" in await db.contacts.index_information():
+        return counts
+    
+    # Rewrite legacy spellings in place, a batch at a time
+    operations = []
+    async for doc in db.contacts.find({}, {"_id": 1, "phone": 1}).batch_size(EXPORT_BATCH_SIZE):
+        number, _ = normalize_phone(doc.get("phone"))
+        if number is None:
+            counts["invalid"] += 1
+        elif number != doc["phone"]:
+            operations.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"phone": number}}))
+        if len(operations) >= CSV_INGEST_BATCH_SIZE:
+            await db.contacts.bulk_write(operations, ordered=False)
+            counts["normalized"] += len(operations)
+            operations = []
+    if operations:
+        await db.contacts.bulk_write(operations, ordered=False)
+        counts["normalized"] += len(operations)
+    
+    # Merge each set of duplicates into its oldest contact, applying the
+    # others oldest first as repeated uploads would. One sorted aggregation
+    # hands back every group's documents, so contacts is read only once.
+    duplicates = db.contacts.aggregate([
+        {"$sort": {"phone": ASCENDING, "created_at": ASCENDING, "id": ASCENDING}},
+        {"$group": {
+            "_id": "$phone",
+            "docs": {"$push": {"_id": "$_id", "id": "$id", "name": "$name", "additional_fields": "$additional_fields"}},
+        }},
+        {"$match": {"docs.1": {"$exists": True}}},
+    ], allowDiskUse=True)
+    
+    # Repointing message history looks logs up by contact_id
+    await db.message_logs.create_indexes([
+        index for index in COLLECTION_INDEXES["message_logs"] if index.document["name"] == "contact_id_created_at_id"
+    ])
+    
+    contact_operations, log_operations = [], []
+    async for group in duplicates:
+        keeper, others = group["docs"][0], group["docs"][1:]
+        fields = dict(keeper.get("additional_fields") or {})
+        for doc in others:
+            fields.update(doc.get("additional_fields") or {})
+        
+        contact_operations.append(UpdateOne(
+            {"_id": keeper["_id"]}, {"$set": {"name": others[-1]["name"], "additional_fields": fields}}
+        ))
+        contact_operations.append(DeleteMany({"_id": {"$in": [doc["_id"] for doc in others]}}))
+        # Message history follows the contact it was sent to
+        log_operations.append(UpdateMany(
+            {"contact_id": {"$in": [doc["id"] for doc in others]}}, {"$set": {"contact_id": keeper["id"]}}
+        ))
+        counts["merged"] += len(others)
+        
+        if len(contact_operations) >= CSV_INGEST_BATCH_SIZE:
+            await db.contacts.bulk_write(contact_operations, ordered=False)
+            await db.message_logs.bulk_write(log_operations, ordered=False)
+            contact_operations, log_operations = [], []
+    if contact_operations:
+        await db.contacts.bulk_write(contact_operations, ordered=False)
+        await db.message_logs.bulk_write(log_operations, ordered=False)
+    
+    if any(counts.values()):
+        logging.info(f"Migrated contact phones: {counts['normalized']} normalized, "
+                     f"{counts['merged']} duplicates merged, {counts['invalid']} invalid left as stored")
+    return counts
+
+async def ensure_indexes() -> Dict[str, List[str]]:
+    """Create every declared index that is missing; returns the names that failed per collection"""
+    failed = {}
+    for collection, indexes in COLLECTION_INDEXES.items():
+        for index in indexes:
+            # One call per index so a failing unique index doesn't block the others
+            try:
+                await db[collection].create_indexes([index])
+            except OperationFailure as e:
+                name = index.document["name"]
+                logging.warning(f"Could not create index {collection}.{name}: {e}")
+                failed.setdefault(collection, []).append(name)
+    return failed
+
+async def describe_indexes(collection: str) -> dict:
+    info = await db[collection].index_information()
+    try:
+        stats = await db.command({"collStats": collection})
+        sizes = stats.get("indexSizes", {})
+    except OperationFailure:
+        sizes = {}
+    
+    declared = {index.document["name"] for index in COLLECTION_INDEXES.get(collection, [])}
+    return {
+        "indexes": [
+            {
+                "name": name,
+                "keys": [[field, direction] for field, direction in spec["key"]],
+                "unique": spec.get("unique", False),
+                "size_bytes": sizes.get(name),
+            }
+            for name, spec in info.items()
+        ],
+        "missing": sorted(declared - set(info)),
+    }
+
+# Keyset pagination
+# Lists are ordered newest first on (created_at, id); the cursor is the sort key
+# of the last document returned, encoded so clients treat it as opaque.
+def encode_cursor(doc: dict) -> str:
+    key = json.dumps([doc["created_at"].isoformat(), doc["id"]])
+    return base64.urlsafe_b64encode(key.encode()).decode()
+
+def decode_cursor(cursor: str) -> dict:
+    """Return the filter selecting documents after the cursor"""
+    try:
+        created_at, doc_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        created_at = datetime.fromisoformat(created_at)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return {"$or": [
+        {"created_at": {"$lt": created_at}},
+        {"created_at": created_at, "id": {"$lt": doc_id}},
+    ]}
+
+def parse_fields(fields: Optional[str], model) -> Optional[List[str]]:
+    # "name,phone" -> ["name", "phone"], validated against the model's fields
+    if not fields:
+        return None
+    requested = [field.strip() for field in fields.split(',') if field.strip()]
+    unknown = [field for field in requested if field not in model.model_fields]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return requested
+
+async def fetch_page(collection, query: dict, cursor: Optional[str], limit: int,
+                     fields: Optional[List[str]], response: Response) -> List[dict]:
+    """Read one page newest first and set X-Next-Cursor when more documents follow"""
+    if cursor:
+        query = {"$and": [query, decode_cursor(cursor)]} if query else decode_cursor(cursor)
+    
+    projection = {"_id": 0}
+    if fields:
+        projection.update({field: 1 for field in {*fields, "created_at", "id"}})
+    
+    docs = await collection.find(query, projection).sort(
+        [("created_at", -1), ("id", -1)]
+    ).limit(limit + 1).to_list(limit + 1)
+    
+    if len(docs) > limit:
+        docs = docs[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(docs[-1])
+    
+    if fields:
+        docs = [{field: doc[field] for field in fields if field in doc} for doc in docs]
+    return docs
+
+# Fast list responses
+# List endpoints project the model's fields in MongoDB and serialize the raw
+# documents with orjson, instead of building a model per document that
+# FastAPI then validates and encodes again. Defaults are filled in for fields
+# a stored document lacks, so the JSON has the shape the model would give.
+@lru_cache(maxsize=None)
+def model_projection(model) -> dict:
+    return {"_id": 0, **{field: 1 for field in model.model_fields}}
+
+@lru_cache(maxsize=None)
+def optional_model_fields(model) -> tuple:
+    return tuple((name, field) for name, field in model.model_fields.items() if not field.is_required())
+
+def fill_model_defaults(docs: List[dict], model) -> List[dict]:
+    optional = optional_model_fields(model)
+    for doc in docs:
+        for name, field in optional:
+            if name not in doc:
+                doc[name] = field.get_default(call_default_factory=True)
+    return docs
+
+def fast_json_response(docs: List[dict], response: Optional[Response] = None) -> Response:
+    # A returned Response replaces the injected one, so carry the page cursor over
+    headers = {}
+    if response is not None and "X-Next-Cursor" in response.headers:
+        headers["X-Next-Cursor"] = response.headers["X-Next-Cursor"]
+    return Response(orjson.dumps(docs), media_type="application/json", headers=headers)
+
+# Streaming export
+def json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def csv_cell(value):
+    # Nested documents (additional_fields) are written as a JSON object in one cell
+    if isinstance(value, dict):
+        return json.dumps(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return '' if value is None else value
+
+def export_filter(status: Optional[str], since: Optional[datetime], until: Optional[datetime]) -> dict:
+    query = {}
+    if status:
+        query["status"] = status
+    if since or until:
+        query["created_at"] = {}
+        if since:
+            query["created_at"]["$gte"] = since
+        if until:
+            query["created_at"]["$lt"] = until
+    return query
+
+def message_log_filter(status: Optional[str], phone: Optional[str], contact_id: Optional[str],
+                       campaign_id: Optional[str], since: Optional[datetime], until: Optional[datetime]) -> dict:
+    """Mongo query for the message log filters; status may be a comma-separated list"""
+    statuses = [value.strip() for value in (status or '').split(',') if value.strip()]
+    query = export_filter(statuses[0] if len(statuses) == 1 else None, since, until)
+    if len(statuses) > 1:
+        query["status"] = {"$in": statuses}
+    if phone:
+        # Logs store E.164; accept the same spellings the CSV import does
+        normalized, _ = normalize_phone(phone)
+        query["phone"] = normalized or phone
+    if contact_id:
+        query["contact_id"] = contact_id
+    if campaign_id:
+        query["campaign_id"] = campaign_id
+    return query
+
+async def stream_export(collection, query: dict, columns: List[str], export_format: str):
+    """Yield NDJSON or CSV chunks straight from the cursor, EXPORT_BATCH_SIZE rows at a time"""
+    projection = {"_id": 0, **{column: 1 for column in columns}}
+    cursor = collection.find(query, projection).sort("created_at", 1).batch_size(EXPORT_BATCH_SIZE)
+    
+    buffer = io.StringIO()
+    writer = None
+    if export_format == "csv":
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+    
+    rows = 0
+    async for doc in cursor:
+        if writer:
+            writer.writerow([csv_cell(doc.get(column)) for column in columns])
+        else:
+            buffer.write(json.dumps({column: doc.get(column) for column in columns}, default=json_default))
+            buffer.write('\n')
+        
+        rows += 1
+        if rows % EXPORT_BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def export_response(collection, query: dict, model, export_format: str, name: str) -> StreamingResponse:
+    if export_format not in ("ndjson", "csv"):
+        raise HTTPException(status_code=400, detail="format must be 'ndjson' or 'csv'")
+    
+    media_type = "text/csv" if export_format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        stream_export(collection, query, list(model.model_fields), export_format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{name}.{export_format}"'}
+    )
+
+# CSV ingestion
+def new_message_log_doc(contact: dict, message: str, status: str, sent_at: Optional[datetime] = None,
+                        error_message: Optional[str] = None, campaign_id: Optional[str] = None) -> dict:
+    # Same shape as MessageLog.dict(), built directly for the bulk send path
+    now = datetime.utcnow()
+    return {
+        "id": str(uuid.uuid4()),
+        "contact_id": contact["id"],
+        "phone": contact["phone"],
+        "message": message,
+        "status": status,
+        "sent_at": sent_at,
+        "error_message": error_message,
+        "attempts": 0,
+        "next_attempt_at": now if status == "pending" else None,
+        "claimed_by": None,
+        "claimed_at": None,
+        "campaign_id": campaign_id,
+        "created_at": now,
+    }
+
+def new_contact_doc(name: str, phone: str, additional_fields: Dict[str, str]) -> dict:
+    # Same shape as Contact.dict(), built directly to avoid a model per row
+    return {
+        "id": str(uuid.uuid4()),
+        "name": name,
+        "phone": phone,
+        "additional_fields": additional_fields,
+        "created_at": datetime.utcnow(),
+    }
+
+def normalize_header(column: str) -> str:
+    # "Phone_Number", " phone  number " and "PHONE NUMBER" all resolve to "phone number"
+    return ' '.join(column.replace('_', ' ').split()).lower()
+
+def compile_row_extractor(header: List[str], aliases: Optional[Dict[str, List[str]]] = None):
+    """Resolve the CSV header once and return a function mapping a row to (name, phone, additional_fields)"""
+    aliases = aliases or CSV_COLUMN_ALIASES
+    
+    positions = {}
+    for index, column in enumerate(header):
+        positions.setdefault(normalize_header(column), []).append(index)
+    
+    def resolve(role):
+        # Column indices for a role, in alias priority order
+        return tuple(index for alias in aliases.get(role, [])
+                     for index in positions.get(normalize_header(alias), []))
+    
+    name_columns = resolve("name")
+    phone_columns = resolve("phone")
+    excluded = set(name_columns) | set(phone_columns) | set(resolve("ignore"))
+    extra_columns = tuple((column, index) for index, column in enumerate(header) if index not in excluded)
+    width = len(header)
+    
+    def first_value(row, columns):
+        for index in columns:
+            value = row[index].strip()
+            if value:
+                return value
+        return ''
+    
+    def extract(row):
+        if len(row) < width:
+            row = row + [''] * (width - len(row))
+        additional_fields = {column: row[index] for column, index in extra_columns
+                             if row[index] and row[index].strip()}
+        return first_value(row, name_columns), first_value(row, phone_columns), additional_fields
+    
+    return extract
+
+def iter_contact_rows(reader, aliases: Optional[Dict[str, List[str]]] = None):
+    """Yield (name, phone, additional_fields) per CSV row, or None for rows that are skipped"""
+    header = next(reader, None)
+    if header is None:
+        return
+    extract = compile_row_extractor(header, aliases)
+    
+    for row in reader:
+        if not row:
+            continue
+        
+        name, phone, additional_fields = extract(row)
+        
+        # Skip empty rows or rows without both name and phone
+        if not name or not phone:
+            yield None
+            continue
+        
+        yield name, phone, additional_fields
+
+def prepare_contact_batch(rows, country_code: str):
+    """Take the next batch of rows and return (rows_parsed, contact_docs, skipped, invalid_phones)"""
+    batch = list(islice(rows, CSV_INGEST_BATCH_SIZE))
+    complete = [row for row in batch if row is not None]
+    
+    # Normalize the whole phone column at once; only E.164 numbers are stored
+    numbers, _ = normalize_phone_column([phone for _, phone, _ in complete], country_code)
+    contact_docs = [new_contact_doc(name, number, additional_fields)
+                    for (name, _, additional_fields), number in zip(complete, numbers) if number]
+    
+    return len(batch), contact_docs, len(batch) - len(complete), len(complete) - len(contact_docs)
+
+async def upsert_contact_batch(contact_docs: List[dict]) -> dict:
+    """Merge a batch of contacts into db.contacts keyed on phone.
+
+    Returns inserted/updated/unchanged counts per distinct phone in the batch,
+    however many rows spell it.
+    """
+    phones = list({doc["phone"] for doc in contact_docs})
+    existing = await db.contacts.find(
+        {"phone": {"$in": phones}},
+        {"_id": 0, "phone": 1, "name": 1, "additional_fields": 1}
+    ).to_list(None)
+    
+    stored = {doc["phone"]: doc for doc in existing}
+    merged = {}  # phone -> contact after every row of the batch
+    
+    # Apply rows in file order so repeated phones within a batch merge like separate uploads
+    for doc in contact_docs:
+        phone = doc["phone"]
+        current = merged.get(phone) or stored.get(phone)
+        if current is None:
+            merged[phone] = doc
+            continue
+        merged_fields = {**current.get("additional_fields", {}), **doc["additional_fields"]}
+        merged[phone] = {**current, "name": doc["name"], "additional_fields": merged_fields}
+    
+    # Compare each phone's final state with what is stored, once
+    counts = {"inserted": 0, "updated": 0, "unchanged": 0}
+    pending = {}  # phone -> contact to insert or fields to $set
+    for phone, doc in merged.items():
+        previous = stored.get(phone)
+        if previous is None:
+            counts["inserted"] += 1
+        elif doc["name"] == previous["name"] and doc["additional_fields"] == previous.get("additional_fields", {}):
+            counts["unchanged"] += 1
+            continue
+        else:
+            counts["updated"] += 1
+        pending[phone] = doc
+    
+    operations = []
+    for phone, doc in pending.items():
+        if phone in stored:
+            operations.append(UpdateOne(
+                {"phone": phone},
+                {"$set": {"name": doc["name"], "additional_fields": doc["additional_fields"]}}
+            ))
+        else:
+            # $setOnInsert keeps a concurrent import of the same phone from failing on the unique index
+            new_fields = {key: value for key, value in doc.items() if key != "phone"}
+            operations.append(UpdateOne({"phone": phone}, {"$setOnInsert": new_fields}, upsert=True))
+    
+    if operations:
+        with MONGO_WRITE_SECONDS.time(operation="contacts_upsert"):
+            await db.contacts.bulk_write(operations, ordered=False)
+        MONGO_DOCUMENTS_WRITTEN.inc(len(operations), operation="contacts_upsert")
+    return counts
+
+async def ingest_contacts_csv(binary_file, country_code: str = DEFAULT_COUNTRY_CODE, on_progress=None) -> dict:
+    """Parse a binary CSV stream and upsert its contacts in bounded batches"""
+    csv_file = io.TextIOWrapper(binary_file, encoding='utf-8', newline='')
+    rows = iter_contact_rows(csv.reader(csv_file))
+    
+    counts = {"rows_parsed": 0, "inserted": 0, "updated": 0, "unchanged": 0, "skipped": 0, "invalid_phones": 0}
+    try:
+        while True:
+            # Parse the next batch off the event loop, then flush it to MongoDB
+            with CSV_PARSE_SECONDS.time():
+                parsed, contact_docs, skipped, invalid_phones = await run_in_threadpool(
+                    prepare_contact_batch, rows, country_code
+                )
+            if not parsed:
+                break
             
-            send_button = None
-            for selector in send_selectors:
-                try:
-                    send_button = WebDriverWait(driver, 10).until(
-                        EC.element_to_be_clickable((By.XPATH, selector))
-                    )
-                    print(f"Found send button with selector: {selector}")
-                    break
-                except TimeoutException:
-                    continue
+            CSV_ROWS.inc(parsed - skipped - invalid_phones, outcome="accepted")
+            CSV_ROWS.inc(skipped, outcome="skipped")
+            CSV_ROWS.inc(invalid_phones, outcome="invalid_phone")
+            counts["rows_parsed"] += parsed
+            counts["skipped"] += skipped + invalid_phones
+            counts["invalid_phones"] += invalid_phones
+            if contact_docs:
+                for key, value in (await upsert_contact_batch(contact_docs)).items():
+                    counts[key] += value
             
-            if send_button:
-                # Click send button
-                driver.execute_script("arguments[0].click();", send_button)
-                print("Clicked send button")
-                
-                # Wait to ensure message is sent
-                await asyncio.sleep(3)
-                
-                return {"success": True}
-            else:
-                # If no send button found, try alternative approach
-                print("Send button not found, trying alternative method")
-                
-                # Try to find the text input and press Enter
-                try:
-                    text_input = WebDriverWait(driver, 5).until(
-                        EC.presence_of_element_located((By.XPATH, "//div[@contenteditable='true' and @data-tab='10']"))
-                    )
-                    text_input.send_keys(Keys.ENTER)
-                    await asyncio.sleep(2)
-                    return {"success": True}
-                except:
-                    return {"success": False, "error": "Could not find send mechanism"}
-                
-        except Exception as e:
-            print(f"Error finding send button: {e}")
-            return {"success": False, "error": f"Could not send message: {str(e)}"}
+            if on_progress:
+                await on_progress(counts)
+    finally:
+        csv_file.detach()
+    
+    return counts
+
+async def run_import_job(job_id: str, path: str, country_code: str):
+    async def save_progress(counts):
+        await db.import_jobs.update_one({"id": job_id}, {"$set": dict(counts)})
     
+    async def heartbeat():
+        while True:
+            await asyncio.sleep(IMPORT_HEARTBEAT_INTERVAL)
+            await db.import_jobs.update_one(
+                {"id": job_id, "owner": IMPORT_WORKER_ID}, {"$set": {"heartbeat_at": datetime.utcnow()}}
+            )
+    
+    beating = asyncio.create_task(heartbeat())
+    try:
+        await db.import_jobs.update_one(
+            {"id": job_id},
+            {"$set": {"status": "running", "started_at": datetime.utcnow()}}
+        )
+        with open(path, 'rb') as f:
+            counts = await ingest_contacts_csv(f, country_code, on_progress=save_progress)
+        await db.import_jobs.update_one(
+            {"id": job_id},
+            {"$set": {**counts, "status": "completed", "finished_at": datetime.utcnow()}}
+        )
     except Exception as e:
-        print(f"Error in send_whatsapp_message_real: {e}")
-        return {"success": False, "error": str(e)}
+        logging.error(f"Contact import {job_id} failed: {e}")
+        await db.import_jobs.update_one(
+            {"id": job_id},
+            {"$set": {"status": "failed", "error_message": str(e), "finished_at": datetime.utcnow()}}
+        )
+    finally:
+        beating.cancel()
+        os.unlink(path)
+
+async def fail_stale_imports() -> int:
+    """Mark failed the unfinished imports whose process stopped sending heartbeats"""
+    cutoff = datetime.utcnow() - timedelta(seconds=IMPORT_STALE_AFTER)
+    result = await db.import_jobs.update_many(
+        {
+            "status": {"$in": ["queued", "running"]},
+            # This process's own jobs are alive even if a long batch delayed a heartbeat
+            "owner": {"$ne": IMPORT_WORKER_ID},
+            # Jobs from before heartbeats fall back to their creation time
+            "$or": [
+                {"heartbeat_at": {"$lt": cutoff}},
+                {"heartbeat_at": None, "created_at": {"$lt": cutoff}},
+            ],
+        },
+        {"$set": {"status": "failed", "error_message": "Interrupted: its server process stopped",
+                  "finished_at": datetime.utcnow()}}
+    )
+    if result.modified_count:
+        logging.warning(f"Marked {result.modified_count} interrupted contact imports as failed")
+    return result.modified_count
+
+async def run_import_reaper():
+    while True:
+        try:
+            await fail_stale_imports()
+        except Exception as e:
+            logging.error(f"Import job cleanup failed: {e}")
+        await asyncio.sleep(IMPORT_STALE_AFTER / 2)
+
+def import_job_progress(job: dict) -> dict:
+    # Rows per second over the running time of the job
+    throughput = 0.0
+    if job.get("started_at"):
+        elapsed = ((job.get("finished_at") or datetime.utcnow()) - job["started_at"]).total_seconds()
+        if elapsed > 0:
+            throughput = round(job["rows_parsed"] / elapsed, 1)
+    return {**ImportJob(**job).dict(), "rows_per_second": throughput}
 
 # API Routes
 @api_router.get("/")
@@ -241,48 +2310,35 @@ async def root():
 
 @api_router.get("/whatsapp/check-ready")
 async def check_whatsapp_ready():
-    global driver
-    try:
-        if not driver:
-            return {"ready": False, "message": "WhatsApp driver not initialized"}
-        
-        # Check if we can find the main chat interface
-        try:
-            driver.find_element(By.XPATH, "//div[@data-testid='chat-list'] | //div[contains(@class, 'chat')] | //*[@id='main']")
-            return {"ready": True, "message": "WhatsApp Web is ready for sending messages"}
-        except:
-            return {"ready": False, "message": "WhatsApp Web not fully loaded or needs authentication"}
-    
-    except Exception as e:
-        return {"ready": False, "message": f"Error checking WhatsApp status: {str(e)}"}
+    # Served from the last sample; the browser is never touched per request
+    session = session_pool.primary
+    if not session.driver:
+        return {"ready": False, "message": "WhatsApp driver not initialized"}
+    if session.status["ready"]:
+        return {"ready": True, "message": "WhatsApp Web is ready for sending messages",
+                "checked_at": session.status["checked_at"]}
+    return {"ready": False, "message": "WhatsApp Web not fully loaded or needs authentication",
+            "checked_at": session.status["checked_at"]}
 
 @api_router.post("/whatsapp/test-send")
 async def test_whatsapp_send():
     """Test sending a message to verify WhatsApp automation is working"""
-    global driver
+    session = session_pool.primary
     try:
-        if not driver:
+        if not session.driver:
             return {"success": False, "message": "WhatsApp driver not initialized"}
         
         # Try to access WhatsApp Web main interface
-        driver.get("https://web.whatsapp.com")
+        await session.run(open_url, "https://web.whatsapp.com")
         await asyncio.sleep(3)
         
-        try:
-            # Look for the main interface
-            main_element = driver.find_element(By.XPATH, "//div[@data-testid='chat-list'] | //div[contains(@class, 'chat')] | //*[@id='main']")
-            if main_element:
-                return {"success": True, "message": "✅ WhatsApp Web automation is ready for bulk sending!"}
-        except:
-            pass
+        # Look for the main interface
+        if await session.run(find_element_or_none, MAIN_INTERFACE_XPATH):
+            return {"success": True, "message": "✅ WhatsApp Web automation is ready for bulk sending!"}
         
         # Check if QR code is present (needs authentication)
-        try:
-            qr_element = driver.find_element(By.XPATH, "//canvas[@aria-label='Scan me!'] | //div[contains(@class, 'qr')]")
-            if qr_element:
-                return {"success": False, "message": "📱 Please scan the QR code in WhatsApp Web to authenticate for automatic sending"}
-        except:
-            pass
+        if await session.run(find_element_or_none, QR_CODE_XPATH):
+            return {"success": False, "message": "📱 Please scan the QR code in WhatsApp Web to authenticate for automatic sending"}
         
         return {"success": False, "message": "WhatsApp Web status unclear. Please ensure you're logged in."}
         
@@ -291,49 +2347,33 @@ async def test_whatsapp_send():
 
 @api_router.get("/whatsapp/status", response_model=WhatsAppStatus)
 async def whatsapp_status():
-    global driver, whatsapp_authenticated
-    
-    # For now, let's provide a more user-friendly approach
-    # Instead of automatically initializing, we'll let users manually initialize
-    
-    if not driver:
-        return WhatsAppStatus(
-            authenticated=False,
-            qr_available=False,
-            message="Ready to connect. Click 'Connect WhatsApp' to open WhatsApp Web."
-        )
-    
-    is_auth = check_whatsapp_auth()
-    
-    if is_auth:
-        message = "✅ WhatsApp is connected and ready to send messages!"
-    else:
-        message = "📱 Please scan the QR code in WhatsApp Web to authenticate"
-    
-    return WhatsAppStatus(
-        authenticated=is_auth,
-        qr_available=not is_auth and driver is not None,
-        message=message
-    )
+    # Users initialize manually via /whatsapp/init; this only reports the cached state
+    return session_pool.primary.status_payload()
+
+@api_router.get("/whatsapp/status/stream")
+async def whatsapp_status_stream(session: int = 0):
+    """Server-Sent Events feed of a session's status, pushed whenever a sample changes it"""
+    if not 0 <= session < len(session_pool.sessions):
+        raise HTTPException(status_code=404, detail=f"Unknown WhatsApp session {session}")
+    target = session_pool.sessions[session]
+    return event_stream_response(f"whatsapp_status:{session}", snapshot=target.status_payload)
+
+@api_router.get("/whatsapp/sessions")
+async def list_whatsapp_sessions():
+    return [session.describe() for session in session_pool.sessions]
 
 @api_router.post("/whatsapp/init")
-async def init_whatsapp():
-    global driver
+async def init_whatsapp(session: int = 0):
+    if not 0 <= session < len(session_pool.sessions):
+        raise HTTPException(status_code=404, detail=f"Unknown WhatsApp session {session}")
     
     # For demonstration purposes, we'll simulate the WhatsApp connection process
     # In production, users would need to scan QR code manually
     
     try:
-        # Clean up any existing session
-        if driver:
-            try:
-                driver.quit()
-            except:
-                pass
-            driver = None
-        
-        # Try to initialize the driver
-        success = init_whatsapp_driver()
+        # Clean up any existing browser for this session and start a new one
+        success = await session_pool.sessions[session].start()
+        await session_pool.notify()
         
         if success:
             return {
@@ -360,71 +2400,86 @@ async def init_whatsapp():
         }
 
 @api_router.post("/contacts/upload")
-async def upload_contacts(file: UploadFile = File(...)):
+async def upload_contacts(file: UploadFile = File(...), background: bool = False,
+                          country_code: str = DEFAULT_COUNTRY_CODE):
     if not file.filename.endswith('.csv'):
         raise HTTPException(status_code=400, detail="Only CSV files are supported")
     
+    if not re.fullmatch(r'[1-9]\d{0,2}', country_code):
+        raise HTTPException(status_code=400, detail="country_code must be 1-3 digits without a leading zero")
+    
     try:
-        content = await file.read()
-        csv_data = content.decode('utf-8')
-        
-        # Parse CSV
-        csv_file = io.StringIO(csv_data)
-        reader = csv.DictReader(csv_file)
-        
-        contacts = []
-        for row in reader:
-            # Extract name and phone from CSV - handle various column name formats
-            name = (row.get('name', '') or row.get('Name', '') or row.get('NAME', '') or 
-                   row.get('Contact Name', '') or row.get('contact_name', '')).strip()
-            
-            phone = (row.get('phone', '') or row.get('Phone', '') or row.get('PHONE', '') or 
-                    row.get('number', '') or row.get('Phone Number', '') or row.get('phone_number', '') or
-                    row.get('Contact Number', '') or row.get('contact_number', '')).strip()
-            
-            # Skip empty rows or rows without both name and phone
-            if not name or not phone:
-                continue
+        await file.seek(0)
+        
+        if background:
+            # Copy the spooled upload to a file the worker owns, since the
+            # UploadFile is closed once this request finishes
+            def spool_to_disk():
+                with tempfile.NamedTemporaryFile(prefix="contacts-import-", suffix=".csv", delete=False) as tmp:
+                    shutil.copyfileobj(file.file, tmp)
+                    return tmp.name
             
-            # Ensure phone number starts with + for international format
-            if not phone.startswith('+'):
-                # Add +91 for Indian numbers if they don't have country code
-                if len(phone) == 10:
-                    phone = f"+91{phone}"
-                else:
-                    phone = f"+{phone}"
+            path = await run_in_threadpool(spool_to_disk)
+            job = ImportJob(filename=file.filename, owner=IMPORT_WORKER_ID)
+            await db.import_jobs.insert_one(job.dict())
             
-            # Store additional fields (exclude common name/phone variations)
-            exclude_keys = ['name', 'Name', 'NAME', 'phone', 'Phone', 'PHONE', 'number', 
-                           'Phone Number', 'phone_number', 'Contact Name', 'contact_name',
-                           'Contact Number', 'contact_number', 'Sno', 'sno', 'SNO', 's.no']
-            additional_fields = {k: v for k, v in row.items() 
-                               if k not in exclude_keys and v and str(v).strip()}
+            task = asyncio.create_task(run_import_job(job.id, path, country_code))
+            import_tasks.add(task)
+            task.add_done_callback(import_tasks.discard)
             
-            contact = Contact(
-                name=name,
-                phone=phone,
-                additional_fields=additional_fields
-            )
-            contacts.append(contact)
+            return {
+                "success": True,
+                "message": f"Import of {file.filename} started",
+                "job_id": job.id
+            }
         
-        # Store in database
-        contact_dicts = [contact.dict() for contact in contacts]
-        await db.contacts.insert_many(contact_dicts)
+        # The upload is already spooled by Starlette, so read it through an
+        # incremental decoder instead of loading the whole payload into memory
+        counts = await ingest_contacts_csv(file.file, country_code)
+        count = counts["inserted"] + counts["updated"] + counts["unchanged"]
         
         return {
             "success": True,
-            "message": f"Uploaded {len(contacts)} contacts successfully",
-            "count": len(contacts)
+            "message": f"Uploaded {count} contacts successfully ({counts['inserted']} new, {counts['updated']} updated)",
+            "count": count,
+            "inserted": counts["inserted"],
+            "updated": counts["updated"],
+            "unchanged": counts["unchanged"],
+            "skipped": counts["skipped"],
+            "invalid_phones": counts["invalid_phones"]
         }
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing CSV: {str(e)}")
 
+@api_router.get("/contacts/imports/{job_id}")
+async def get_import_job(job_id: str):
+    job = await db.import_jobs.find_one({"id": job_id})
+    if not job:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return import_job_progress(job)
+
 @api_router.get("/contacts", response_model=List[Contact])
-async def get_contacts():
-    contacts = await db.contacts.find().sort("created_at", -1).to_list(1000)
-    return [Contact(**contact) for contact in contacts]
+async def get_contacts(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    fields: Optional[str] = None
+):
+    """List contacts newest first; pass the X-Next-Cursor header back as cursor for the next page"""
+    projected = parse_fields(fields, Contact)
+    contacts = await fetch_page(db.contacts, {}, cursor, limit, projected or list(Contact.model_fields), response)
+    if not projected:
+        fill_model_defaults(contacts, Contact)
+    return fast_json_response(contacts, response)
+
+@api_router.get("/contacts/export")
+async def export_contacts(
+    export_format: str = Query("ndjson", alias="format"),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None
+):
+    return export_response(db.contacts, export_filter(None, since, until), Contact, export_format, "contacts")
 
 @api_router.delete("/contacts")
 async def clear_contacts():
@@ -434,115 +2489,279 @@ async def clear_contacts():
 @api_router.post("/messages/template")
 async def save_template(template: MessageTemplate):
     await db.templates.insert_one(template.dict())
-    return {"success": True, "template_id": template.id}
+    return {"success": True, "template_id": template.id, "placeholders": template.placeholders}
 
 @api_router.get("/messages/templates", response_model=List[MessageTemplate])
 async def get_templates():
-    templates = await db.templates.find().sort("created_at", -1).to_list(100)
-    return [MessageTemplate(**template) for template in templates]
+    templates = await db.templates.find({}, model_projection(MessageTemplate)).sort("created_at", -1).to_list(100)
+    for template in fill_model_defaults(templates, MessageTemplate):
+        # Derived from the content, as MessageTemplate's validator does
+        template["placeholders"] = compile_template(template["content"]).placeholders
+    return fast_json_response(templates)
 
 @api_router.post("/messages/send-bulk")
 async def send_bulk_messages(request: BulkMessageRequest):
+    campaign_id = str(uuid.uuid4())
     try:
-        # Get contacts
         contact_filter = {"id": {"$in": request.contact_ids}} if request.contact_ids else {}
-        contacts = await db.contacts.find(contact_filter).to_list(1000)
         
-        # First, clear any existing ready_for_batch_send logs to avoid duplicates
-        await db.message_logs.delete_many({"status": "ready_for_batch_send"})
-        await db.message_logs.delete_many({"status": "ready_to_send"})
-        await db.message_logs.delete_many({"status": "demo_sent"})
+        # Earlier runs keep their logs; everything this run writes is tagged with its campaign
+        campaign = Campaign(id=campaign_id, template=request.template, auto_send=request.auto_send)
+        await db.campaigns.insert_one(campaign.model_dump())
         
-        message_logs = []
+        total_contacts = 0
         sent_count = 0
         failed_count = 0
+        missing_placeholders = {}
         
-        # Process each contact and create personalized messages
-        for contact in contacts:
-            try:
-                # Personalize message
-                message = request.template.replace("{name}", contact["name"])
-                
-                # Replace any additional field placeholders
-                for field, value in contact.get("additional_fields", {}).items():
-                    message = message.replace(f"{{{field}}}", str(value))
-                
-                # Since we're in a server environment, create WhatsApp Web direct links
-                # This will allow the user to click and send automatically
-                phone_clean = re.sub(r'[^\d]', '', contact["phone"])
-                if phone_clean.startswith('91'):
-                    phone_clean = phone_clean[2:]  # Remove country code
-                
-                whatsapp_url = f"https://web.whatsapp.com/send?phone=91{phone_clean}&text={quote(message)}"
-                
-                status = "ready_for_batch_send"
-                sent_count += 1
-                error_message = None
-                
-                print(f"✅ Prepared message for {contact['name']}: {whatsapp_url[:100]}...")
-                
-                # Log message with WhatsApp URL
-                log_entry = MessageLog(
-                    contact_id=contact["id"],
-                    phone=contact["phone"],
-                    message=message,
-                    status=status,
-                    sent_at=datetime.utcnow(),
-                    error_message=whatsapp_url  # Store the URL in error_message field temporarily
-                )
-                
-                message_logs.append(log_entry.dict())
-                
-                await asyncio.sleep(0.1)
+        # Parse the template once; each contact is then a single join
+        template = compile_template(request.template)
+        
+        # Stream contacts from the cursor and write their logs one chunk at a time
+        cursor = db.contacts.find(
+            contact_filter, {"_id": 0, "id": 1, "name": 1, "phone": 1, "additional_fields": 1}
+        ).batch_size(SEND_BATCH_SIZE)
+        
+        while True:
+            contacts = await cursor.to_list(SEND_BATCH_SIZE)
+            if not contacts:
+                break
+            
+            # Render the whole chunk without awaiting; the insert below is where
+            # other requests get the event loop
+            message_logs = []
+            prepared_at = datetime.utcnow()
+            render_started = time.perf_counter()
+            for contact in contacts:
+                try:
+                    # Personalize message
+                    message, missing = template.render(contact)
+                    for field in missing:
+                        missing_placeholders[field] = missing_placeholders.get(field, 0) + 1
+                    
+                    if request.auto_send:
+                        # Picked up by the send queue workers
+                        message_logs.append(new_message_log_doc(contact, message, "pending", campaign_id=campaign_id))
+                    else:
+                        # Since we're in a server environment, create WhatsApp Web direct links
+                        # This will allow the user to click and send automatically
+                        whatsapp_url = f"https://web.whatsapp.com/send?phone={contact['phone'].lstrip('+')}&text={quote(message)}"
+                        
+                        # Log message with WhatsApp URL (stored in error_message temporarily)
+                        message_logs.append(new_message_log_doc(
+                            contact, message, "ready_for_batch_send", sent_at=prepared_at,
+                            error_message=whatsapp_url, campaign_id=campaign_id
+                        ))
+                    sent_count += 1
                 
-            except Exception as e:
-                failed_count += 1
-                print(f"❌ Error preparing message for {contact['name']}: {e}")
-                log_entry = MessageLog(
-                    contact_id=contact["id"],
-                    phone=contact["phone"],
-                    message=request.template,
-                    status="failed",
-                    error_message=str(e)
-                )
-                message_logs.append(log_entry.dict())
+                except Exception as e:
+                    failed_count += 1
+                    logging.error(f"Error preparing message for {contact.get('name')}: {e}")
+                    message_logs.append(new_message_log_doc(
+                        contact, request.template, "failed", error_message=str(e), campaign_id=campaign_id
+                    ))
+            TEMPLATE_RENDER_SECONDS.observe(time.perf_counter() - render_started)
+            TEMPLATE_MESSAGES_RENDERED.inc(len(contacts))
+            
+            total_contacts += len(contacts)
+            chunk_counts = {}
+            for log in message_logs:
+                chunk_counts[log["status"]] = chunk_counts.get(log["status"], 0) + 1
+            send_progress.register(campaign_id, chunk_counts)
+            with MONGO_WRITE_SECONDS.time(operation="message_logs_insert"):
+                await db.message_logs.insert_many(message_logs, ordered=False)
+            MONGO_DOCUMENTS_WRITTEN.inc(len(message_logs), operation="message_logs_insert")
+        
+        await db.campaigns.update_one(
+            {"id": campaign_id}, {"$set": {"status": "sending", "total_contacts": total_contacts}}
+        )
+        send_progress.close(campaign_id)
         
-        # Store logs in database
-        if message_logs:
-            await db.message_logs.insert_many(message_logs)
+        logging.info(f"Prepared {sent_count} messages for {total_contacts} contacts ({failed_count} failed)")
         
         return {
             "success": True,
-            "total_contacts": len(contacts),
+            "campaign_id": campaign_id,
+            "total_contacts": total_contacts,
             "sent_count": sent_count,
             "failed_count": failed_count,
-            "message": f"🚀 {sent_count} messages prepared for automatic batch sending! Check Message Logs for one-click sending links.",
+            "missing_placeholders": missing_placeholders,
+            "message": (
+                f"🚀 {sent_count} messages queued for sending by the server's WhatsApp sessions."
+                if request.auto_send else
+                f"🚀 {sent_count} messages prepared for automatic batch sending! Check Message Logs for one-click sending links."
+            ),
             "batch_ready": True
         }
     
     except Exception as e:
+        await db.campaigns.update_one({"id": campaign_id}, {"$set": {"status": "failed"}})
+        send_progress.close(campaign_id)
         raise HTTPException(status_code=500, detail=f"Error preparing bulk messages: {str(e)}")
 
+@api_router.get("/messages/queue")
+async def get_send_queue():
+    counts = {}
+    for status in ("pending", "sending", "sent", "failed", "unconfirmed"):
+        counts[status] = await db.message_logs.count_documents({"status": status})
+    return {
+        **counts,
+        **send_queue.transport.describe(),
+        "rate_per_minute_per_session": SEND_RATE_PER_MINUTE,
+    }
+
+@api_router.get("/campaigns", response_model=List[Campaign])
+async def list_campaigns(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)
+):
+    """List campaigns newest first with their stored summaries"""
+    return await fetch_page(db.campaigns, {}, cursor, limit, None, response)
+
+@api_router.get("/campaigns/{campaign_id}", response_model=Campaign)
+async def get_campaign(campaign_id: str):
+    campaign = await get_campaign_summary(campaign_id)
+    if campaign is None:
+        raise HTTPException(status_code=404, detail=f"Unknown campaign {campaign_id}")
+    return campaign
+
+@api_router.post("/campaigns/{campaign_id}/refresh", response_model=Campaign)
+async def refresh_campaign(campaign_id: str):
+    """Recompute a campaign's summary now, e.g. after its logs were edited"""
+    campaign = await refresh_campaign_stats(campaign_id)
+    if campaign is None:
+        raise HTTPException(status_code=404, detail=f"Unknown campaign {campaign_id}")
+    return campaign
+
+@api_router.get("/messages/progress/stream")
+async def send_progress_stream(campaign_id: Optional[str] = None):
+    """Server-Sent Events feed of message state changes and run counters.
+
+    With campaign_id only that bulk run is streamed, starting with its
+    current counters; without it every run is streamed.
+    """
+    if campaign_id is None:
+        return event_stream_response("send_progress")
+    loaded = await send_progress.load(campaign_id)
+    if loaded is None:
+        raise HTTPException(status_code=404, detail=f"Unknown campaign {campaign_id}")
+    return event_stream_response(
+        f"send_progress:{campaign_id}",
+        snapshot=lambda: send_progress.summary(campaign_id) or loaded,
+    )
+
+@api_router.get("/messages/progress/{campaign_id}")
+async def get_send_progress(campaign_id: str):
+    summary = await send_progress.load(campaign_id)
+    if summary is None:
+        raise HTTPException(status_code=404, detail=f"Unknown campaign {campaign_id}")
+    return summary
+
 @api_router.get("/messages/logs", response_model=List[MessageLog])
-async def get_message_logs():
-    logs = await db.message_logs.find().sort("created_at", -1).to_list(500)
-    return [MessageLog(**log) for log in logs]
+async def get_message_logs(
+    response: Response,
+    status: Optional[str] = None,
+    phone: Optional[str] = None,
+    contact_id: Optional[str] = None,
+    campaign_id: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_LOG_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    fields: Optional[str] = None
+):
+    """List message logs newest first, filtered server-side; X-Next-Cursor pages as for contacts"""
+    query = message_log_filter(status, phone, contact_id, campaign_id, since, until)
+    projected = parse_fields(fields, MessageLog)
+    logs = await fetch_page(db.message_logs, query, cursor, limit, projected or list(MessageLog.model_fields), response)
+    if not projected:
+        fill_model_defaults(logs, MessageLog)
+    return fast_json_response(logs, response)
+
+@api_router.get("/messages/logs/export")
+async def export_message_logs(
+    export_format: str = Query("ndjson", alias="format"),
+    status: Optional[str] = None,
+    phone: Optional[str] = None,
+    contact_id: Optional[str] = None,
+    campaign_id: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None
+):
+    query = message_log_filter(status, phone, contact_id, campaign_id, since, until)
+    return export_response(db.message_logs, query, MessageLog, export_format, "message_logs")
 
 @api_router.delete("/messages/logs")
 async def clear_message_logs():
     result = await db.message_logs.delete_many({})
     return {"success": True, "deleted_count": result.deleted_count}
 
+@api_router.get("/admin/indexes")
+async def get_indexes():
+    return {collection: await describe_indexes(collection) for collection in COLLECTION_INDEXES}
+
+@api_router.get("/metrics")
+async def api_metrics():
+    # Same as /metrics, for deployments that only route /api to the backend
+    return await metrics()
+
+@app.get("/metrics")
+async def metrics():
+    return Response(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 # Include the router in the main app
 app.include_router(api_router)
 
+@lru_cache(maxsize=4096)
+def route_template(method: str, path: str, root_path: str = "") -> str:
+    # Label by route template, not raw path, so ids don't multiply the series;
+    # cached because walking the routes costs more than the rest of the middleware
+    scope = {"type": "http", "method": method, "path": path, "root_path": root_path}
+    for route in app.router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+class MetricsMiddleware:
+    """Per-route request count, latency and in-flight gauge (plain ASGI, so streamed bodies are timed to the end)"""
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        
+        method = scope["method"]
+        route = route_template(method, scope["path"], scope.get("root_path", ""))
+        status = 500
+        
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+        
+        HTTP_IN_FLIGHT.inc(method=method, route=route)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_IN_FLIGHT.dec(method=method, route=route)
+            HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, method=method, route=route)
+            HTTP_REQUESTS.inc(method=method, route=route, status=status)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
+app.add_middleware(MetricsMiddleware)
 
 # Configure logging
 logging.basicConfig(
@@ -553,9 +2772,9 @@ logger = logging.getLogger(__name__)
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    global driver
-    if driver:
-        driver.quit()
+    send_queue.stop()
+    app.state.import_reaper.cancel()
+    await session_pool.stop()
     client.close()
 
 # Initialize WhatsApp on startup
@@ -563,3 +2782,12 @@ async def shutdown_db_client():
 async def startup_event():
     # Don't initialize WhatsApp automatically - let users do it manually
     logging.info("WhatsApp CSV Messenger API started")
+    
+    await migrate_contact_phones()
+    await ensure_indexes()
+    session_pool.start_health_checks()
+    send_queue.start()
+    
+    # Imports whose process died will never finish; another process's live
+    # imports keep their heartbeat fresh and are left alone
+    app.state.import_reaper = asyncio.create_task(run_import_reaper())
@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+Offline Benchmark Suite for WhatsApp Automation System
+Drives the CSV ingest, contact listing, send preparation and message log
+query paths in-process against a local mongod or an in-memory stand-in,
+and compares throughput, p50/p99 latency and per-phase peak RSS with a
+JSON baseline
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import resource
+import string
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).parent
+DEFAULT_BASELINE = ROOT_DIR / 'benchmark_baseline.json'
+
+# The server reads its settings at import time; nothing here may reach a
+# browser or the send queue. Every run drops its collections, so the
+# database is always the benchmark's own, never an exported DB_NAME.
+BENCHMARK_DB_NAME = os.environ.get('BENCHMARK_DB_NAME', 'whatsapp_benchmark')
+if 'benchmark' not in BENCHMARK_DB_NAME:
+    raise SystemExit(f"❌ BENCHMARK_DB_NAME={BENCHMARK_DB_NAME!r} is dropped on every run; "
+                     f"its name must contain 'benchmark'")
+os.environ['DB_NAME'] = BENCHMARK_DB_NAME
+os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+os.environ.setdefault('SEND_TRANSPORT', 'mock')
+sys.path.insert(0, str(ROOT_DIR / 'backend'))
+
+import httpx
+import server
+
+# One INFO line per request would dominate the run
+logging.getLogger('httpx').setLevel(logging.WARNING)
+
+# Same template shape as the UI: name plus extra columns, one with a default
+TEMPLATE = "Hi {name}, your {col_0|account} is ready. Reference: {col_1}"
+
+def percentile(samples, p):
+    """Nearest-rank percentile of an unsorted list"""
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+def current_rss_mb():
+    """Resident set size right now, from /proc on Linux"""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return round(pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024), 1)
+    except OSError:
+        # No /proc (macOS): fall back to the process high-water mark, in bytes there
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+class RssSampler:
+    """Samples RSS on a thread while one phase runs, so each phase gets its own peak"""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.start_mb = self.peak_mb = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak_mb = max(self.peak_mb, current_rss_mb())
+
+    def __enter__(self):
+        self.start_mb = self.peak_mb = current_rss_mb()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak_mb = max(self.peak_mb, current_rss_mb())
+
+def write_csv(path, rows, extra_columns, seed=42):
+    """Synthetic contacts: mixed phone spellings, ~1% invalid, random extra fields.
+
+    Written line by line so building the input never weighs on the measured RSS.
+    """
+    rng = random.Random(seed)
+    words = [''.join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 10))) for _ in range(500)]
+
+    with open(path, 'w') as f:
+        f.write(','.join(['name', 'phone'] + [f'col_{i}' for i in range(extra_columns)]) + '\n')
+        for i in range(rows):
+            national = f"9{i:09d}"
+            spelling = rng.random()
+            if spelling < 0.01:
+                phone = f"12ab{i}"
+            elif spelling < 0.4:
+                phone = f"+91{national}"
+            elif spelling < 0.6:
+                phone = f"{national[:5]} {national[5:]}"
+            else:
+                phone = national
+            extras = [rng.choice(words) for _ in range(extra_columns)]
+            f.write(','.join([f"Contact {i}", phone] + extras) + '\n')
+
+class WhatsAppBackendBenchmark:
+    def __init__(self, backend, repeats=5):
+        self.backend = backend
+        self.repeats = repeats
+        self.results = {}
+        self.client = None
+
+    async def setup(self):
+        if self.backend == 'memory':
+            try:
+                from mongomock_motor import AsyncMongoMockClient
+            except ImportError:
+                raise SystemExit("❌ --backend memory needs mongomock-motor (pip install mongomock-motor)")
+            server.db = AsyncMongoMockClient()[os.environ['DB_NAME']]
+
+        await self.reset()
+        self.client = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=server.app), base_url='http://benchmark', timeout=None
+        )
+
+    async def teardown(self):
+        await self.client.aclose()
+        await self.reset()
+
+    async def reset(self):
+        for name in ('contacts', 'message_logs', 'campaigns', 'import_jobs'):
+            await server.db[name].drop()
+        await server.ensure_indexes()
+
+    def record(self, name, count, latencies, rss):
+        """Store throughput (items/s over total time), latency percentiles in ms and the phase's RSS"""
+        elapsed = sum(latencies)
+        self.results[name] = {
+            'throughput': round(count / elapsed, 1) if elapsed else None,
+            'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+            'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+            'requests': len(latencies),
+            'items': count,
+            'peak_rss_mb': rss.peak_mb,
+            'rss_growth_mb': round(rss.peak_mb - rss.start_mb, 1),
+        }
+        result = self.results[name]
+        print(f"  ⏱️  {name}: {result['throughput']}/s, p50 {result['p50_ms']}ms, "
+              f"p99 {result['p99_ms']}ms, peak RSS {result['peak_rss_mb']}MB "
+              f"(+{result['rss_growth_mb']}MB)")
+
+    async def timed(self, method, url, **kwargs):
+        started = time.perf_counter()
+        response = await self.client.request(method, url, **kwargs)
+        elapsed = time.perf_counter() - started
+        if response.status_code != 200:
+            raise RuntimeError(f"{method} {url} returned {response.status_code}: {response.text[:200]}")
+        return response, elapsed
+
+    async def bench_upload(self, label, csv_path, rows):
+        # Each repeat ingests into an empty database, streaming the file from disk
+        latencies = []
+        with RssSampler() as rss:
+            for _ in range(self.repeats):
+                await self.reset()
+                with open(csv_path, 'rb') as f:
+                    _, elapsed = await self.timed(
+                        'POST', '/api/contacts/upload', files={'file': ('contacts.csv', f, 'text/csv')}
+                    )
+                latencies.append(elapsed)
+        self.record(f"upload_contacts[{label}]", rows * self.repeats, latencies, rss)
+
+    async def bench_contacts(self, label):
+        latencies, count, cursor = [], 0, None
+        with RssSampler() as rss:
+            while True:
+                params = {'limit': 1000, **({'cursor': cursor} if cursor else {})}
+                response, elapsed = await self.timed('GET', '/api/contacts', params=params)
+                latencies.append(elapsed)
+                count += len(response.json())
+                cursor = response.headers.get('x-next-cursor')
+                if not cursor:
+                    break
+        self.record(f"get_contacts[{label}]", count, latencies, rss)
+
+    async def bench_send_bulk(self, label):
+        # Each repeat prepares the run from scratch; the last one is kept for the log queries
+        latencies, count = [], 0
+        with RssSampler() as rss:
+            for _ in range(self.repeats):
+                for name in ('message_logs', 'campaigns'):
+                    await server.db[name].delete_many({})
+                response, elapsed = await self.timed(
+                    'POST', '/api/messages/send-bulk', json={'template': TEMPLATE, 'contact_ids': []}
+                )
+                latencies.append(elapsed)
+                data = response.json()
+                count += data['total_contacts']
+        self.record(f"send_bulk_messages[{label}]", count, latencies, rss)
+        return data['campaign_id']
+
+    async def bench_logs(self, label, campaign_id, repeats=20):
+        # The first page the UI loads, and an operator's filtered lookups
+        queries = [
+            {},
+            {'status': 'ready_for_batch_send', 'limit': 100},
+            {'campaign_id': campaign_id, 'limit': 100, 'fields': 'phone,status'},
+        ]
+        latencies, count = [], 0
+        with RssSampler() as rss:
+            for _ in range(repeats):
+                for params in queries:
+                    response, elapsed = await self.timed('GET', '/api/messages/logs', params=params)
+                    latencies.append(elapsed)
+                    count += len(response.json())
+        self.record(f"get_message_logs[{label}]", count, latencies, rss)
+
+    async def run(self, sizes, extra_columns):
+        await self.setup()
+        try:
+            with tempfile.TemporaryDirectory(prefix='whatsapp-benchmark-') as tmp:
+                for rows in sizes:
+                    for extras in extra_columns:
+                        label = f"{rows}x{extras}"
+                        print(f"\n📋 Benchmarking {rows} rows with {extras} extra columns...")
+                        csv_path = os.path.join(tmp, f"contacts-{label}.csv")
+                        write_csv(csv_path, rows, extras)
+                        await self.bench_upload(label, csv_path, rows)
+                        await self.bench_contacts(label)
+                        campaign_id = await self.bench_send_bulk(label)
+                        await self.bench_logs(label, campaign_id)
+                        os.unlink(csv_path)
+        finally:
+            await self.teardown()
+        return self.results
+
+def compare(results, baseline, tolerance):
+    """Regressions: throughput down, or p99 / peak RSS up, by more than tolerance"""
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        if previous.get('throughput') and result['throughput'] is not None:
+            if result['throughput'] < previous['throughput'] * (1 - tolerance):
+                regressions.append(f"{name}: throughput {previous['throughput']} -> {result['throughput']}/s")
+        for metric in ('p99_ms', 'peak_rss_mb'):
+            if previous.get(metric) and result[metric] > previous[metric] * (1 + tolerance):
+                regressions.append(f"{name}: {metric} {previous[metric]} -> {result[metric]}")
+    return regressions
+
+def main():
+    """Main benchmark execution"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--backend', choices=['mongod', 'memory'], default='mongod',
+                        help="mongod uses MONGO_URL (database BENCHMARK_DB_NAME, default whatsapp_benchmark, "
+                             "is dropped); memory uses mongomock-motor")
+    parser.add_argument('--sizes', default='10000,100000',
+                        help="comma-separated CSV row counts, e.g. 10000,100000,1000000")
+    parser.add_argument('--extra-columns', default='2,10', help="comma-separated extra column counts")
+    parser.add_argument('--repeats', type=int, default=5,
+                        help="timed runs of each upload and send-bulk, for their p50/p99")
+    parser.add_argument('--baseline', default=str(DEFAULT_BASELINE))
+    parser.add_argument('--update-baseline', action='store_true', help="write these results as the new baseline")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="allowed relative slowdown before flagging")
+    parser.add_argument('--output', default=str(ROOT_DIR / 'benchmark_results.json'))
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    extra_columns = [int(count) for count in args.extra_columns.split(',')]
+
+    print("WhatsApp Automation Backend Benchmark")
+    print(f"Backend: {args.backend}, sizes: {sizes}, extra columns: {extra_columns}, repeats: {args.repeats}")
+    print(f"Timestamp: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+
+    benchmark = WhatsAppBackendBenchmark(args.backend, args.repeats)
+    results = asyncio.run(benchmark.run(sizes, extra_columns))
+
+    report = {
+        'timestamp': datetime.now().isoformat(),
+        'backend': args.backend,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n📄 Results saved to: {args.output}")
+
+    baseline_path = Path(args.baseline)
+    if args.update_baseline:
+        with open(baseline_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"📌 Baseline updated: {baseline_path}")
+        return True
+
+    if not baseline_path.exists():
+        print(f"ℹ️  No baseline at {baseline_path}; run with --update-baseline to create one")
+        return True
+
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    if baseline.get('backend') != args.backend:
+        print(f"⚠️  Baseline was recorded against {baseline.get('backend')}, not {args.backend}; comparing anyway")
+
+    regressions = compare(results, baseline['results'], args.tolerance)
+    print("\n" + "=" * 60)
+    if regressions:
+        print(f"⚠️  {len(regressions)} regressions beyond {args.tolerance:.0%}:")
+        for regression in regressions:
+            print(f"  ❌ {regression}")
+        return False
+    print(f"🎉 No regressions beyond {args.tolerance:.0%} against {baseline_path}")
+    return True
+
+if __name__ == "__main__":
+    success = main()
+    exit(0 if success else 1)
@@ -2,16 +2,24 @@
 """
 Backend API Testing Script for WhatsApp Automation System
 Tests the core API endpoints for CSV upload, contacts, message logs, and WhatsApp status
+
+With --load it instead runs many concurrent virtual users against the API
+and reports per-endpoint latency histograms and error rates
 """
 
 import requests
 import json
 import io
 import csv
+import sys
 import time
 from datetime import datetime
 import os
 from pathlib import Path
+import argparse
+import asyncio
+import random
+import httpx
 
 # Load environment variables to get the backend URL
 def load_env_file(file_path):
@@ -246,6 +254,82 @@ Vikram Singh,+917654321098,Innovation Hub,Lead"""
         
         return all(result[1] for result in additional_tests)
     
+    def test_list_response_shapes(self):
+        """Check each list endpoint returns exactly what its model would serialize"""
+        # The backend models define the response shapes
+        sys.path.insert(0, str(Path(__file__).parent / 'backend'))
+        os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+        os.environ.setdefault('DB_NAME', 'whatsapp_test')
+        from server import Contact, MessageTemplate, MessageLog
+        
+        shape_tests = []
+        
+        # Make sure every list has something to check: a template, and one
+        # prepared (never sent) message for a single contact
+        try:
+            contacts = self.session.get(f"{API_BASE_URL}/contacts", params={"limit": 1}).json()
+            if not contacts:
+                self.session.post(
+                    f"{API_BASE_URL}/contacts/upload",
+                    files={'file': ('shapes.csv', "name,phone,city\nShape Check,9876500000,Pune\n", 'text/csv')}
+                )
+                contacts = self.session.get(f"{API_BASE_URL}/contacts", params={"limit": 1}).json()
+            self.session.post(f"{API_BASE_URL}/messages/template", json={"content": "Hi {name} from {city|us}"})
+            self.session.post(
+                f"{API_BASE_URL}/messages/send-bulk",
+                json={"template": "Hi {name}", "contact_ids": [contact["id"] for contact in contacts]}
+            )
+        except Exception as e:
+            shape_tests.append(("Shape Seed Data", False, f"Error: {str(e)}"))
+        
+        for path, model in (("/contacts", Contact), ("/messages/templates", MessageTemplate), ("/messages/logs", MessageLog)):
+            try:
+                response = self.session.get(f"{API_BASE_URL}{path}", params={"limit": 50})
+                if response.status_code != 200:
+                    shape_tests.append((f"Shape {path}", False, f"HTTP {response.status_code}"))
+                    continue
+                
+                items = response.json()
+                if not items:
+                    shape_tests.append((f"Shape {path}", False, "Empty list, nothing to check"))
+                    continue
+                
+                # Round-tripping through the model must give back the same document
+                mismatched = [item for item in items if model(**item).model_dump(mode="json") != item]
+                if mismatched:
+                    expected = model(**mismatched[0]).model_dump(mode="json")
+                    differences = sorted(key for key in set(expected) | set(mismatched[0])
+                                         if expected.get(key) != mismatched[0].get(key))
+                    shape_tests.append((f"Shape {path}", False, f"{len(mismatched)} items differ from {model.__name__}",
+                                        f"fields: {', '.join(differences)}"))
+                else:
+                    shape_tests.append((f"Shape {path}", True, f"{len(items)} items match {model.__name__}"))
+            except Exception as e:
+                shape_tests.append((f"Shape {path}", False, f"Error: {str(e)}"))
+        
+        # A projection returns only the requested keys
+        for path, requested in (("/contacts", ["name", "phone"]), ("/messages/logs", ["phone", "status"])):
+            try:
+                response = self.session.get(f"{API_BASE_URL}{path}", params={"fields": ",".join(requested), "limit": 10})
+                if response.status_code != 200:
+                    shape_tests.append((f"Projection {path}", False, f"HTTP {response.status_code}"))
+                    continue
+                items = response.json()
+                extra = [sorted(item) for item in items if set(item) != set(requested)]
+                if not items:
+                    shape_tests.append((f"Projection {path}", False, "Empty list, nothing to check"))
+                elif extra:
+                    shape_tests.append((f"Projection {path}", False, f"Unexpected keys: {extra[0]}"))
+                else:
+                    shape_tests.append((f"Projection {path}", True, f"Only {', '.join(requested)} returned"))
+            except Exception as e:
+                shape_tests.append((f"Projection {path}", False, f"Error: {str(e)}"))
+        
+        for test in shape_tests:
+            self.log_test(*test)
+        
+        return all(result[1] for result in shape_tests)
+    
     def run_all_tests(self):
         """Run all backend API tests"""
         print("🚀 Starting WhatsApp Backend API Tests")
@@ -258,7 +342,8 @@ Vikram Singh,+917654321098,Innovation Hub,Lead"""
             ("Contacts Retrieval", self.test_contacts_retrieval),
             ("Message Logs", self.test_message_logs_endpoint),
             ("WhatsApp Status", self.test_whatsapp_status_endpoint),
-            ("Additional Endpoints", self.test_additional_endpoints)
+            ("Additional Endpoints", self.test_additional_endpoints),
+            ("List Response Shapes", self.test_list_response_shapes)
         ]
         
         passed = 0
@@ -288,6 +373,173 @@ Vikram Singh,+917654321098,Innovation Hub,Lead"""
                     print(f"  ❌ {result['test']}: {result['message']}")
             return False
 
+# Latency histogram bucket upper bounds in milliseconds; the last bucket is open-ended
+LATENCY_BUCKETS_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+
+# Relative weight of each endpoint in the default request mix
+DEFAULT_REQUEST_MIX = "upload=1,contacts=4,logs=4,status=10"
+
+class WhatsAppLoadGenerator:
+    """Concurrent virtual users issuing a weighted mix of API requests"""
+    
+    def __init__(self, concurrency, duration, ramp_up, mix, upload_rows=50):
+        self.concurrency = concurrency
+        self.duration = duration
+        self.ramp_up = ramp_up
+        self.mix = mix
+        self.upload_rows = upload_rows
+        self.stats = {}
+        self.started = None
+    
+    @staticmethod
+    def parse_mix(mix):
+        weights = {}
+        for part in mix.split(','):
+            name, _, weight = part.partition('=')
+            weights[name.strip()] = float(weight or 1)
+        unknown = set(weights) - set(WhatsAppLoadGenerator.ENDPOINTS)
+        if unknown:
+            raise SystemExit(f"❌ Unknown endpoints in --mix: {', '.join(sorted(unknown))}; "
+                             f"choose from {', '.join(WhatsAppLoadGenerator.ENDPOINTS)}")
+        return weights
+    
+    def upload_csv(self):
+        # Random numbers so uploads mix inserts with the occasional update
+        lines = ["name,phone,company"]
+        for _ in range(self.upload_rows):
+            number = random.randint(6000000000, 9999999999)
+            lines.append(f"Load User {number},{number},Load Test Co")
+        return "\n".join(lines) + "\n"
+    
+    async def request_upload(self, client):
+        files = {'file': ('load_contacts.csv', self.upload_csv(), 'text/csv')}
+        return await client.post("/contacts/upload", files=files)
+    
+    async def request_contacts(self, client):
+        return await client.get("/contacts", params={'limit': 100})
+    
+    async def request_logs(self, client):
+        return await client.get("/messages/logs", params={'limit': 100})
+    
+    async def request_status(self, client):
+        return await client.get("/whatsapp/status")
+    
+    ENDPOINTS = {
+        'upload': request_upload,
+        'contacts': request_contacts,
+        'logs': request_logs,
+        'status': request_status,
+    }
+    
+    def record(self, endpoint, elapsed, error=None):
+        stats = self.stats.setdefault(endpoint, {
+            'count': 0, 'errors': 0, 'error_samples': {}, 'latencies': [],
+            'histogram': [0] * (len(LATENCY_BUCKETS_MS) + 1),
+        })
+        latency_ms = elapsed * 1000
+        stats['count'] += 1
+        stats['latencies'].append(latency_ms)
+        bucket = next((i for i, bound in enumerate(LATENCY_BUCKETS_MS) if latency_ms <= bound), len(LATENCY_BUCKETS_MS))
+        stats['histogram'][bucket] += 1
+        if error:
+            stats['errors'] += 1
+            stats['error_samples'][error] = stats['error_samples'].get(error, 0) + 1
+    
+    async def virtual_user(self, client, user, deadline):
+        # Users start evenly spread over the ramp-up period
+        await asyncio.sleep(self.ramp_up * user / self.concurrency)
+        names = list(self.mix)
+        weights = [self.mix[name] for name in names]
+        while time.monotonic() < deadline:
+            endpoint = random.choices(names, weights)[0]
+            started = time.perf_counter()
+            try:
+                response = await self.ENDPOINTS[endpoint](self, client)
+                error = None if response.status_code < 400 else f"HTTP {response.status_code}"
+            except httpx.HTTPError as e:
+                error = type(e).__name__
+            self.record(endpoint, time.perf_counter() - started, error)
+    
+    async def run(self):
+        limits = httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+        async with httpx.AsyncClient(base_url=API_BASE_URL, limits=limits, timeout=30) as client:
+            self.started = time.monotonic()
+            deadline = self.started + self.ramp_up + self.duration
+            await asyncio.gather(*(self.virtual_user(client, user, deadline) for user in range(self.concurrency)))
+        return self.report(time.monotonic() - self.started)
+    
+    @staticmethod
+    def percentile(latencies, p):
+        ordered = sorted(latencies)
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))], 2)
+    
+    def report(self, elapsed):
+        endpoints = {}
+        print("\n" + "=" * 60)
+        print(f"🏁 LOAD SUMMARY: {self.concurrency} users, {elapsed:.1f}s "
+              f"({self.ramp_up:g}s ramp-up + {self.duration:g}s)")
+        for endpoint, stats in sorted(self.stats.items()):
+            latencies = stats['latencies']
+            summary = {
+                'requests': stats['count'],
+                'requests_per_second': round(stats['count'] / elapsed, 1),
+                'error_rate': round(stats['errors'] / stats['count'], 4),
+                'errors': stats['error_samples'],
+                'p50_ms': self.percentile(latencies, 50),
+                'p90_ms': self.percentile(latencies, 90),
+                'p99_ms': self.percentile(latencies, 99),
+                'max_ms': round(max(latencies), 2),
+                'histogram_ms': {
+                    (f"<={bound}" if i < len(LATENCY_BUCKETS_MS) else f">{LATENCY_BUCKETS_MS[-1]}"): count
+                    for i, (bound, count) in enumerate(zip(LATENCY_BUCKETS_MS + [None], stats['histogram']))
+                },
+            }
+            endpoints[endpoint] = summary
+            
+            print(f"\n📋 {endpoint}: {summary['requests']} requests, {summary['requests_per_second']}/s, "
+                  f"{summary['error_rate']:.2%} errors")
+            print(f"   p50 {summary['p50_ms']}ms  p90 {summary['p90_ms']}ms  "
+                  f"p99 {summary['p99_ms']}ms  max {summary['max_ms']}ms")
+            widest = max(stats['histogram']) or 1
+            for label, count in summary['histogram_ms'].items():
+                if count:
+                    print(f"   {label:>8} ms | {'█' * max(1, round(40 * count / widest))} {count}")
+            for error, count in summary['errors'].items():
+                print(f"   ❌ {error}: {count}")
+        
+        # Status is answered from memory, so its tail is the event loop's tail
+        if 'status' in endpoints:
+            print(f"\n🔎 Event-loop stall indicator (status max latency): {endpoints['status']['max_ms']}ms")
+        return endpoints
+
+def run_load(args):
+    """Load mode execution"""
+    mix = WhatsAppLoadGenerator.parse_mix(args.mix)
+    print("WhatsApp Automation Backend Load Generator")
+    print(f"Target: {API_BASE_URL}")
+    print(f"Users: {args.concurrency}, ramp-up: {args.ramp_up:g}s, duration: {args.duration:g}s, mix: {mix}")
+    print(f"Timestamp: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    
+    generator = WhatsAppLoadGenerator(args.concurrency, args.duration, args.ramp_up, mix, args.upload_rows)
+    endpoints = asyncio.run(generator.run())
+    
+    total = sum(endpoint['requests'] for endpoint in endpoints.values())
+    errors = sum(round(endpoint['error_rate'] * endpoint['requests']) for endpoint in endpoints.values())
+    with open(args.output, 'w') as f:
+        json.dump({
+            'timestamp': datetime.now().isoformat(),
+            'api_base_url': API_BASE_URL,
+            'concurrency': args.concurrency,
+            'ramp_up': args.ramp_up,
+            'duration': args.duration,
+            'mix': mix,
+            'histogram_buckets_ms': LATENCY_BUCKETS_MS,
+            'endpoints': endpoints,
+        }, f, indent=2)
+    
+    print(f"\n📄 Detailed results saved to: {args.output}")
+    return total > 0 and errors / total <= args.max_error_rate
+
 def main():
     """Main test execution"""
     print("WhatsApp Automation Backend API Tester")
@@ -312,5 +564,17 @@ def main():
     return success
 
 if __name__ == "__main__":
-    success = main()
+    parser = argparse.ArgumentParser(description="WhatsApp Automation backend tests and load generator")
+    parser.add_argument('--load', action='store_true', help="run the concurrent load generator instead of the tests")
+    parser.add_argument('--concurrency', type=int, default=20, help="virtual users")
+    parser.add_argument('--duration', type=float, default=60, help="seconds at full concurrency")
+    parser.add_argument('--ramp-up', type=float, default=10, help="seconds to start all users")
+    parser.add_argument('--mix', default=DEFAULT_REQUEST_MIX,
+                        help=f"endpoint=weight list from upload, contacts, logs, status (default {DEFAULT_REQUEST_MIX})")
+    parser.add_argument('--upload-rows', type=int, default=50, help="contacts per uploaded CSV")
+    parser.add_argument('--max-error-rate', type=float, default=0.01, help="fail the run above this error rate")
+    parser.add_argument('--output', default='/app/backend_load_results.json')
+    args = parser.parse_args()
+    
+    success = run_load(args) if args.load else main()
     exit(0 if success else 1)
\ No newline at end of file
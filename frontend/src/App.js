@@ -135,25 +135,41 @@ const WhatsAppMessenger = () => {
     fetchContacts();
     fetchMessageLogs();
     
-    // Polling for WhatsApp status
-    const interval = setInterval(checkWhatsAppStatus, 5000);
-    return () => clearInterval(interval);
+    // The server pushes WhatsApp status changes; fall back to polling if the stream drops
+    let interval = null;
+    const statusStream = new EventSource(`${API}/whatsapp/status/stream`);
+    statusStream.onmessage = (event) => applyWhatsAppStatus(JSON.parse(event.data));
+    statusStream.onerror = () => {
+      statusStream.close();
+      if (!interval) {
+        interval = setInterval(checkWhatsAppStatus, 5000);
+      }
+    };
+    return () => {
+      statusStream.close();
+      if (interval) {
+        clearInterval(interval);
+      }
+    };
   }, []);
 
+  const applyWhatsAppStatus = (status) => {
+    // Check for manual override or existing detection
+    if (whatsappManualOverride) {
+      setWhatsappStatus({
+        authenticated: true,
+        qr_available: false,
+        message: '✅ WhatsApp manually marked as connected!'
+      });
+    } else {
+      setWhatsappStatus(status);
+    }
+  };
+
   const checkWhatsAppStatus = async () => {
     try {
       const response = await axios.get(`${API}/whatsapp/status`);
-      
-      // Check for manual override or existing detection
-      if (whatsappManualOverride) {
-        setWhatsappStatus({
-          authenticated: true,
-          qr_available: false,
-          message: '✅ WhatsApp manually marked as connected!'
-        });
-      } else {
-        setWhatsappStatus(response.data);
-      }
+      applyWhatsAppStatus(response.data);
     } catch (error) {
       console.error('Error checking WhatsApp status:', error);
     }
@@ -206,8 +222,15 @@ const WhatsAppMessenger = () => {
 
   const fetchContacts = async () => {
     try {
-      const response = await axios.get(`${API}/contacts`);
-      setContacts(response.data);
+      // Page through contacts with the keyset cursor, showing each page as it arrives
+      const allContacts = [];
+      let cursor = null;
+      do {
+        const response = await axios.get(`${API}/contacts`, { params: { limit: 1000, cursor } });
+        allContacts.push(...response.data);
+        setContacts([...allContacts]);
+        cursor = response.headers['x-next-cursor'];
+      } while (cursor);
     } catch (error) {
       console.error('Error fetching contacts:', error);
     }
@@ -805,11 +828,8 @@ class EnhancedWhatsAppSender {
   }
 
   formatPhone(phone) {
-    let clean = phone.replace(/\\D/g, '');
-    if (clean.startsWith('91') && clean.length > 10) {
-      clean = clean.substring(2);
-    }
-    return clean;
+    // Contacts are stored in E.164, so the digits already include the country code
+    return phone.replace(/\\D/g, '');
   }
 
   personalizeMessage(template, contact) {
@@ -1292,7 +1312,7 @@ class EnhancedWhatsAppSender {
     console.log(\`📝 Message: \${message.substring(0, 100)}...\`);
     
     // Navigate to contact with message
-    const url = \`https://web.whatsapp.com/send?phone=91\${phone}&text=\${encodeURIComponent(message)}\`;
+    const url = \`https://web.whatsapp.com/send?phone=\${phone}&text=\${encodeURIComponent(message)}\`;
     window.location.href = url;
     
     // Extended wait for page load and WhatsApp processing
@@ -1617,11 +1637,8 @@ let currentIndex = 0;
 
 class SmartManualHelper {
   formatPhone(phone) {
-    let clean = phone.replace(/\\D/g, '');
-    if (clean.startsWith('91') && clean.length > 10) {
-      clean = clean.substring(2);
-    }
-    return clean;
+    // Contacts are stored in E.164, so the digits already include the country code
+    return phone.replace(/\\D/g, '');
   }
 
   personalizeMessage(template, contact) {
@@ -1640,7 +1657,7 @@ class SmartManualHelper {
     
     console.log(\`📱 Contact \${currentIndex + 1}/\${contacts.length}: \${contact.name}\`);
     
-    const url = \`https://web.whatsapp.com/send?phone=91\${phone}&text=\${encodeURIComponent(message)}\`;
+    const url = \`https://web.whatsapp.com/send?phone=\${phone}&text=\${encodeURIComponent(message)}\`;
     window.location.href = url;
     
     currentIndex++;
@@ -0,0 +1,84 @@
+import asyncio
+import csv
+import io
+
+import pytest
+
+import server
+from server import compile_row_extractor, iter_contact_rows, new_contact_doc
+
+
+def test_row_extractor_resolves_aliases_and_extra_columns():
+    extract = compile_row_extractor(["S.No", "Contact_Name", " Phone  Number ", "City", "Plan"])
+    assert extract(["1", "Asha", "9876543210", "Pune", " "]) == ("Asha", "9876543210", {"City": "Pune"})
+
+
+def test_row_extractor_takes_the_first_non_empty_alias():
+    extract = compile_row_extractor(["number", "phone", "name"])
+    # "phone" outranks "number" in CSV_COLUMN_ALIASES
+    assert extract(["111", "222", "Asha"])[1] == "222"
+    assert extract(["111", " ", "Asha"])[1] == "111"
+
+
+def test_row_extractor_pads_short_rows():
+    extract = compile_row_extractor(["name", "phone", "city"])
+    assert extract(["Asha", "9876543210"]) == ("Asha", "9876543210", {})
+
+
+def test_row_extractor_accepts_custom_aliases():
+    extract = compile_row_extractor(["who", "mobile"], {"name": ["who"], "phone": ["mobile"]})
+    assert extract(["Asha", "9876543210"]) == ("Asha", "9876543210", {})
+
+
+def test_iter_contact_rows_skips_incomplete_rows():
+    reader = csv.reader(io.StringIO("name,phone\nAsha,9876543210\n,9876543211\nRavi,\n\n"))
+    assert list(iter_contact_rows(reader)) == [("Asha", "9876543210", {}), None, None]
+
+
+@pytest.fixture
+def contacts_db(monkeypatch):
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    database = mongomock_motor.AsyncMongoMockClient()["whatsapp_unit_tests"]
+    monkeypatch.setattr(server, "db", database)
+    return database
+
+
+def stored_contacts(database):
+    async def read():
+        return await database.contacts.find({}, {"_id": 0, "id": 0, "created_at": 0}).sort("phone", 1).to_list(None)
+    return asyncio.run(read())
+
+
+def test_upsert_inserts_then_reports_unchanged(contacts_db):
+    docs = [new_contact_doc("Asha", "+919876543210", {"city": "Pune"})]
+    assert asyncio.run(server.upsert_contact_batch(docs)) == {"inserted": 1, "updated": 0, "unchanged": 0}
+    again = [new_contact_doc("Asha", "+919876543210", {"city": "Pune"})]
+    assert asyncio.run(server.upsert_contact_batch(again)) == {"inserted": 0, "updated": 0, "unchanged": 1}
+
+
+def test_upsert_merges_repeated_phones_in_file_order(contacts_db):
+    docs = [
+        new_contact_doc("Asha", "+919876543210", {"city": "Pune"}),
+        new_contact_doc("Asha K", "+919876543210", {"plan": "gold"}),
+    ]
+    assert asyncio.run(server.upsert_contact_batch(docs)) == {"inserted": 1, "updated": 0, "unchanged": 0}
+    assert stored_contacts(contacts_db) == [
+        {"name": "Asha K", "phone": "+919876543210", "additional_fields": {"city": "Pune", "plan": "gold"}},
+    ]
+
+
+def test_upsert_counts_each_phone_once(contacts_db):
+    asyncio.run(server.upsert_contact_batch([new_contact_doc("Asha", "+919876543210", {"city": "Pune"})]))
+    # Two spellings of one unchanged number, already normalized
+    docs = [
+        new_contact_doc("Asha", "+919876543210", {"city": "Pune"}),
+        new_contact_doc("Asha", "+919876543210", {}),
+    ]
+    assert asyncio.run(server.upsert_contact_batch(docs)) == {"inserted": 0, "updated": 0, "unchanged": 1}
+
+    changed = [
+        new_contact_doc("Asha", "+919876543210", {"plan": "gold"}),
+        new_contact_doc("Asha", "+919876543210", {"plan": "silver"}),
+    ]
+    assert asyncio.run(server.upsert_contact_batch(changed)) == {"inserted": 0, "updated": 1, "unchanged": 0}
+    assert stored_contacts(contacts_db)[0]["additional_fields"] == {"city": "Pune", "plan": "silver"}
@@ -0,0 +1,27 @@
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+
+from server import decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip_selects_documents_after_it():
+    created_at = datetime(2026, 1, 2, 3, 4, 5, 678000)
+    cursor = encode_cursor({"created_at": created_at, "id": "b"})
+    assert decode_cursor(cursor) == {"$or": [
+        {"created_at": {"$lt": created_at}},
+        {"created_at": created_at, "id": {"$lt": "b"}},
+    ]}
+
+
+def test_cursor_is_url_safe():
+    cursor = encode_cursor({"created_at": datetime(2026, 1, 1), "id": "?>>?" * 8})
+    assert set(cursor) <= set("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_=")
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", "", "W10=", "WyJ4IiwgImIiXQ=="])
+def test_invalid_cursor_is_a_400(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor)
+    assert error.value.status_code == 400
@@ -0,0 +1,69 @@
+import random
+
+import pytest
+
+import server
+from server import normalize_phone, normalize_phone_column
+
+
+SAMPLES = [
+    "9876543210",
+    "09876543210",
+    "+91 98765 43210",
+    "+91-98765-43210",
+    "(987) 654-3210",
+    "98765.43210",
+    "0091 9876543210",
+    "  9876543210  ",
+    "+1 415 555 0100",
+    "+0 123 456 7890",
+    "12345",
+    "1234567890123456",
+    "12ab34",
+    "+",
+    "",
+    "   ",
+    "9876543210\x00",
+    "98765\x0043210",
+    "\x00",
+    "98765 43210\x00 ",
+    "+91 98765 43210 ext",
+    "९८७६५४३२१०",
+]
+
+
+def test_normalize_phone_examples():
+    assert normalize_phone("9876543210") == ("+919876543210", None)
+    assert normalize_phone("09876543210") == ("+919876543210", None)
+    assert normalize_phone("0091 98765 43210") == ("+919876543210", None)
+    assert normalize_phone("+1 (415) 555-0100") == ("+14155550100", None)
+    assert normalize_phone("12ab34") == (None, server.PHONE_INVALID_CHARACTERS)
+    assert normalize_phone("") == (None, server.PHONE_EMPTY)
+    assert normalize_phone("12345") == (None, server.PHONE_TOO_SHORT)
+    assert normalize_phone("+1234567890123456") == (None, server.PHONE_TOO_LONG)
+    assert normalize_phone("+0 123 456 7890") == (None, server.PHONE_INVALID_COUNTRY_CODE)
+
+
+@pytest.mark.parametrize("value", SAMPLES)
+def test_column_matches_scalar(value):
+    numbers, reasons = normalize_phone_column([value])
+    assert (numbers[0], reasons[0]) == normalize_phone(value)
+
+
+def test_column_matches_scalar_in_mixed_batches():
+    # Widths differ within a batch, so padding must never be read as content
+    numbers, reasons = normalize_phone_column(SAMPLES)
+    assert list(zip(numbers, reasons)) == [normalize_phone(value) for value in SAMPLES]
+
+
+def test_column_matches_scalar_on_random_input():
+    rng = random.Random(7)
+    alphabet = "0123456789" * 4 + " -.()/+x\x00"
+    values = [''.join(rng.choices(alphabet, k=rng.randint(0, 18))) for _ in range(2000)]
+    numbers, reasons = normalize_phone_column(values)
+    assert list(zip(numbers, reasons)) == [normalize_phone(value) for value in values]
+
+
+def test_column_uses_the_given_country_code():
+    assert normalize_phone_column(["4155550100"], "1") == (["+14155550100"], [None])
+    assert normalize_phone_column([]) == ([], [])
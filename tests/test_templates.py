@@ -0,0 +1,33 @@
+from server import CompiledTemplate, compile_template
+
+
+def test_placeholders_are_unique_and_ordered():
+    template = CompiledTemplate("Hi {name}, {city|there}! {name} {plan}")
+    assert template.placeholders == ["name", "city", "plan"]
+
+
+def test_render_prefers_additional_fields_then_contact_fields():
+    template = CompiledTemplate("{name} {phone} {city}")
+    contact = {"name": "Asha", "phone": "+919876543210", "additional_fields": {"city": "Pune", "name": "Override"}}
+    assert template.render(contact) == ("Override +919876543210 Pune", [])
+
+
+def test_render_uses_defaults_and_reports_missing_fields():
+    template = CompiledTemplate("Hi {name}, your {plan|basic} plan renews on {date}")
+    message, missing = template.render({"name": "Asha", "additional_fields": {}})
+    assert message == "Hi Asha, your basic plan renews on {date}"
+    assert missing == ["date"]
+
+
+def test_empty_default_and_literal_braces():
+    template = CompiledTemplate("{greeting|}Total: {} {plan|a|b} 50%{ off")
+    assert template.render({"name": "Asha"}) == ("Total: {} a|b 50%{ off", [])
+    assert template.placeholders == ["greeting", "plan"]
+
+
+def test_placeholder_names_are_stripped():
+    assert CompiledTemplate("{ name }").render({"name": "Asha"}) == ("Asha", [])
+
+
+def test_compile_template_is_cached():
+    assert compile_template("Hi {name}") is compile_template("Hi {name}")